@@ -0,0 +1,79 @@
+"""
+Degrees of separation analytics built on single-source BFS layers.
+
+Usage:
+    python analytics.py [directory] --within PERSON_ID K
+    python analytics.py [directory] --histogram SAMPLES [--seed SEED]
+"""
+
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+
+import degrees
+
+
+def people_within(source, k):
+    """
+    Returns how many people are within `k` degrees of `source`,
+    not counting the source itself.
+    """
+    distances, _ = degrees.bfs_layers(source)
+    return sum(1 for distance in distances.values() if 0 < distance <= k)
+
+
+def degree_histogram(samples, seed=0):
+    """
+    Estimates the global degrees of separation histogram by running
+    one full BFS from each of `samples` random people.
+
+    Returns a Counter mapping degrees of separation to how many
+    (source, target) pairs of distinct people have it, with None
+    counting the pairs that are not connected.
+    """
+    rng = random.Random(seed)
+    candidates = sorted(degrees.people)
+    total = len(candidates)
+
+    histogram = Counter()
+    for source in rng.sample(candidates, min(samples, total)):
+        distances, _ = degrees.bfs_layers(source)
+        histogram.update(distance for distance in distances.values() if distance > 0)
+        histogram[None] += total - len(distances)
+    return histogram
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Degrees of separation analytics.")
+    parser.add_argument("directory", nargs="?", default="large")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--within", nargs=2, metavar=("PERSON_ID", "K"),
+                      help="count people within K degrees of a person")
+    mode.add_argument("--histogram", type=int, metavar="SAMPLES",
+                      help="sampled degrees of separation histogram")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("Loading data...")
+    degrees.load_data(args.directory, snapshot=True)
+    print("Data loaded.")
+
+    start = time.perf_counter()
+    if args.within:
+        source, k = args.within[0], int(args.within[1])
+        if source not in degrees.people:
+            sys.exit("Person not found.")
+        print(f"{people_within(source, k)} people within {k} degrees.")
+    else:
+        histogram = degree_histogram(args.histogram, args.seed)
+        pairs = sum(histogram.values())
+        for distance in sorted(d for d in histogram if d is not None):
+            print(f"{distance:>3}: {histogram[distance] / pairs:8.4%}")
+        print(f"Not connected: {histogram[None] / pairs:8.4%}")
+    print(f"Done in {time.perf_counter() - start:.2f} s.")
+
+
+if __name__ == "__main__":
+    main()
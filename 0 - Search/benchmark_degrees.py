@@ -0,0 +1,109 @@
+"""
+Times shortest path queries on a degrees dataset.
+
+Usage: python benchmark_degrees.py [directory] [queries] [seed]
+"""
+
+import random
+import sys
+import time
+
+import degrees
+from graph import CompactGraph
+
+
+def legacy_shortest_path(source, target):
+    """
+    The original search, kept as the "before" reference: a BFS that
+    stores explored people in a list and re-adds people already
+    waiting in the frontier.
+    """
+    explored_states = []
+    frontier = [(source, [])]
+
+    while frontier:
+        person_id, path = frontier.pop(0)
+        explored_states.append(person_id)
+
+        for movie_id, neighbor_id in degrees.neighbors_for_person(person_id):
+            if neighbor_id == person_id or neighbor_id in explored_states:
+                continue
+            if neighbor_id == target:
+                return path + [(movie_id, neighbor_id)]
+            frontier.append((neighbor_id, path + [(movie_id, neighbor_id)]))
+
+    return None
+
+
+def sample_queries(count, seed):
+    """
+    Returns `count` random pairs of distinct people that
+    starred in at least one movie.
+    """
+    rng = random.Random(seed)
+    candidates = sorted(person_id for person_id, person in degrees.people.items()
+                        if person["movies"])
+    return [tuple(rng.sample(candidates, 2)) for _ in range(count)]
+
+
+def time_queries(search, queries):
+    """
+    Runs `search` on every query, returning the time of each one
+    in seconds and the length of each path found.
+    """
+    timings = []
+    lengths = []
+    for source, target in queries:
+        start = time.perf_counter()
+        path = search(source, target)
+        timings.append(time.perf_counter() - start)
+        lengths.append(None if path is None else len(path))
+    return timings, lengths
+
+
+def report(name, timings):
+    """
+    Prints a one line summary of the timings of a search.
+    """
+    timings = sorted(timings)
+    mean = sum(timings) / len(timings)
+    median = timings[len(timings) // 2]
+    worst = timings[-1]
+    print(f"{name:<16} mean {mean * 1000:10.3f} ms   "
+          f"median {median * 1000:10.3f} ms   max {worst * 1000:10.3f} ms")
+
+
+def main():
+    if len(sys.argv) > 4:
+        sys.exit("Usage: python benchmark_degrees.py [directory] [queries] [seed]")
+    directory = sys.argv[1] if len(sys.argv) > 1 else "large"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    print("Loading data...")
+    start = time.perf_counter()
+    degrees.load_data(directory)
+    print(f"Data loaded in {time.perf_counter() - start:.2f} s.")
+
+    queries = sample_queries(count, seed)
+    compact = CompactGraph.from_data(degrees.people, degrees.movies)
+    searches = [
+        ("before (list)", legacy_shortest_path),
+        ("after (dict)", degrees.shortest_path),
+        ("bidirectional", degrees.shortest_path_bidirectional),
+        ("compact (CSR)", compact.shortest_path),
+    ]
+
+    expected = None
+    for name, search in searches:
+        timings, lengths = time_queries(search, queries)
+        report(name, timings)
+        # every search must agree on the degrees of separation
+        if expected is None:
+            expected = lengths
+        elif lengths != expected:
+            sys.exit(f"{name} disagrees with the reference path lengths.")
+
+
+if __name__ == "__main__":
+    main()
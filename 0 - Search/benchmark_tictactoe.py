@@ -0,0 +1,134 @@
+"""
+Self-play benchmark for the tictactoe search modes.
+
+Usage: python benchmark_tictactoe.py [--games N] [--seed SEED] [MODE ...]
+
+Every mode plays N games against itself and N games against a random
+player (taking X and O in turns), reporting move latency, positions
+searched and peak memory. The transposition table and bitboard cache
+start empty for every mode and stay warm across its games; the opening
+book is loaded before timing starts, since it is built offline.
+
+Peak memory is measured on a separate run of one game of each kind,
+since tracing allocations slows the search down.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+import bitboard
+import tictactoe as ttt
+
+MODES = [ttt.MINIMAX, ttt.ALPHABETA, ttt.TRANSPOSITION, ttt.BITBOARD, ttt.BOOK]
+
+
+def reset_caches(mode):
+    """
+    Empties the caches kept across calls to minimax, and resets counters.
+    """
+    ttt.transposition_table.clear()
+    bitboard.value.cache_clear()
+    ttt.reset_node_count()
+    if mode == ttt.BOOK and ttt.opening_book is None:
+        ttt.opening_book = ttt.load_book()
+
+
+def positions_searched():
+    """
+    Returns the positions evaluated since the last call, by any mode.
+    """
+    misses = bitboard.value.cache_info().misses
+    count = ttt.reset_node_count() + misses - positions_searched.misses
+    positions_searched.misses = misses
+    return count
+
+
+positions_searched.misses = 0
+
+
+def play_game(mode, random_player, rng):
+    """
+    Plays one game where the engine in `mode` moves for every player
+    except `random_player` (None for self-play), who moves at random.
+
+    Returns the winner and the time taken by each engine move.
+    """
+    board = ttt.initial_state()
+    latencies = []
+    while not ttt.terminal(board):
+        if ttt.player(board) == random_player:
+            action = rng.choice(sorted(ttt.actions(board)))
+        else:
+            start = time.perf_counter()
+            action = ttt.minimax(board, mode)
+            latencies.append(time.perf_counter() - start)
+        board = ttt.result(board, action)
+    return ttt.winner(board), latencies
+
+
+def benchmark(mode, games, seed):
+    """
+    Runs the games for a mode and returns a dictionary of results.
+    """
+    rng = random.Random(seed)
+    reset_caches(mode)
+    positions_searched()
+
+    latencies = []
+    engine_losses = 0
+    for game in range(games):
+        _, game_latencies = play_game(mode, None, rng)
+        latencies.extend(game_latencies)
+
+        random_player = ttt.O if game % 2 == 0 else ttt.X
+        winner, game_latencies = play_game(mode, random_player, rng)
+        latencies.extend(game_latencies)
+        if winner == random_player:
+            engine_losses += 1
+    positions = positions_searched()
+
+    reset_caches(mode)
+    tracemalloc.start()
+    play_game(mode, None, random.Random(seed))
+    play_game(mode, ttt.O, random.Random(seed))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    elapsed = sum(latencies)
+    return {
+        "mode": mode,
+        "moves": len(latencies),
+        "mean": elapsed / len(latencies),
+        "worst": max(latencies),
+        "positions": positions,
+        "rate": positions / elapsed if elapsed else 0,
+        "peak": peak,
+        "losses": engine_losses
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tictactoe search modes.")
+    parser.add_argument("modes", nargs="*", metavar="MODE",
+                        help=f"modes to compare, any of {', '.join(MODES)}")
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    # checked here, as argparse checks an empty MODE list against choices
+    for mode in args.modes:
+        if mode not in MODES:
+            parser.error(f"invalid mode {mode!r}, choose from {', '.join(MODES)}")
+    modes = args.modes or MODES
+
+    print(f"{'mode':<14}{'moves':>7}{'mean ms':>12}{'worst ms':>12}"
+          f"{'positions':>12}{'pos/sec':>12}{'peak KiB':>10}{'losses':>8}")
+    for mode in modes:
+        r = benchmark(mode, args.games, args.seed)
+        print(f"{r['mode']:<14}{r['moves']:>7}{r['mean'] * 1000:>12.3f}{r['worst'] * 1000:>12.3f}"
+              f"{r['positions']:>12}{r['rate']:>12.0f}{r['peak'] / 1024:>10.0f}{r['losses']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Tic Tac Toe on bitboards
+
+A position is two 9-bit masks, one with the squares taken by X and one
+with the squares taken by O, where square (i, j) is bit 3 * i + j.
+"""
+
+from functools import lru_cache
+
+# All nine squares taken
+FULL = 0b111111111
+
+# Rows, columns and diagonals
+LINES = [0b000000111, 0b000111000, 0b111000000,
+         0b001001001, 0b010010010, 0b100100100,
+         0b100010001, 0b001010100]
+
+# Whether a mask holds three in a row, for every possible mask
+WINS = [any(mask & line == line for line in LINES) for mask in range(FULL + 1)]
+
+# Number of squares taken in every possible mask
+COUNTS = [bin(mask).count("1") for mask in range(FULL + 1)]
+
+
+def x_to_move(x, o):
+    """
+    Returns True if X has the next turn.
+    """
+    return COUNTS[x] == COUNTS[o]
+
+
+def squares(x, o):
+    """
+    Returns the empty squares, in increasing order.
+    """
+    empty = FULL & ~(x | o)
+    return [square for square in range(9) if empty >> square & 1]
+
+
+def play(x, o, square):
+    """
+    Returns the position after the current player takes `square`.
+    """
+    if x_to_move(x, o):
+        return x | 1 << square, o
+    return x, o | 1 << square
+
+
+def terminal(x, o):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    return WINS[x] or WINS[o] or x | o == FULL
+
+
+def utility(x, o):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    if WINS[x]:
+        return 1
+    if WINS[o]:
+        return -1
+    return 0
+
+
+@lru_cache(maxsize=None)
+def value(x, o):
+    """
+    Returns the exact utility value of the position under perfect play.
+    """
+    if terminal(x, o):
+        return utility(x, o)
+    values = [value(*play(x, o, square)) for square in squares(x, o)]
+    return max(values) if x_to_move(x, o) else min(values)
+
+
+def best_move(x, o, order=None):
+    """
+    Returns the best square for the current player, trying squares in
+    `order` (all empty squares by default) and keeping the first of
+    equally good ones. Returns None if the game is over.
+    """
+    if terminal(x, o):
+        return None
+    if order is None:
+        order = squares(x, o)
+
+    maximizing = x_to_move(x, o)
+    best_value = None
+    next_move = None
+    for square in order:
+        square_value = value(*play(x, o, square))
+        if best_value is None or (square_value > best_value if maximizing
+                                  else square_value < best_value):
+            best_value = square_value
+            next_move = square
+    return next_move
@@ -1,7 +1,11 @@
 import csv
 import sys
+import threading
+from collections import OrderedDict, deque
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import (CompactGraph, NamesView, PeopleView, MoviesView,
+                   append_journal, catch_up, load_snapshot, read_csv_tail, snapshot_key)
+from nameindex import NameIndex
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +16,116 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer-indexed copy of the data, when loaded with compact=True
+graph = None
 
-def load_data(directory):
+# Modification times and sizes of the CSV files the dictionaries were loaded from
+data_key = None
+
+# Prefix and trigram index over names, built on first use
+name_index = None
+
+
+class PathCache():
+    """
+    Bounded least recently used cache of shortest paths.
+    A path cached for (source, target) also answers (target, source).
+
+    Safe to share between threads: the cache is only touched while
+    holding a lock, but searches run without it.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.paths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, source, target):
+        """
+        Returns the shortest path from source to target, searching
+        only if neither direction has been cached.
+        """
+        with self.lock:
+            if (source, target) in self.paths:
+                self.paths.move_to_end((source, target))
+                self.hits += 1
+                return self.paths[(source, target)]
+            reverse = (target, source) in self.paths
+            if reverse:
+                self.paths.move_to_end((target, source))
+                self.hits += 1
+                path = self.paths[(target, source)]
+            else:
+                self.misses += 1
+        if reverse:
+            return reverse_path(target, path)
+
+        # search without the lock, so other threads aren't held up
+        path = shortest_path(source, target)
+        with self.lock:
+            self.paths[(source, target)] = path
+            self.paths.move_to_end((source, target))
+            while len(self.paths) > self.maxsize:
+                self.paths.popitem(last=False)
+        return path
+
+    def clear(self):
+        """
+        Forgets every cached path and resets the counters.
+        """
+        with self.lock:
+            self.paths.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns the hit and miss counters and the cache size.
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self.paths), "maxsize": self.maxsize}
+
+
+# Shortest paths already found, cleared whenever data is loaded
+path_cache = PathCache()
+
+
+def load_data(directory, compact=False, snapshot=False):
     """
     Load data from CSV files into memory.
+
+    If `compact` is True, the data is kept in a CompactGraph instead,
+    and `names`, `people` and `movies` become read-only views over it.
+
+    If `snapshot` is True, the CompactGraph is memory-mapped from a binary
+    snapshot next to the CSV files, which is written first if it is
+    missing or out of date. Rows appended to the CSV files since the
+    snapshot was written are read on their own. Implies `compact`.
     """
+    global graph, names, people, movies, name_index, data_key
+    name_index = None
+    path_cache.clear()
+    if snapshot:
+        graph = load_snapshot(directory)
+    elif compact:
+        graph = CompactGraph.from_csv(directory)
+    else:
+        graph = None
+
+    if graph is not None:
+        names = NamesView(graph)
+        people = PeopleView(graph)
+        movies = MoviesView(graph)
+        return
+
+    names = {}
+    people = {}
+    movies = {}
+    data_key = snapshot_key(directory)
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -52,6 +161,82 @@ def load_data(directory):
                 pass
 
 
+def ingest(people_rows=(), movie_rows=(), star_rows=()):
+    """
+    Adds rows shaped like the rows of people.csv, movies.csv and stars.csv
+    to the loaded data, without reloading it. A memory-mapped snapshot
+    also records them, so they survive the next load, until the snapshot
+    is rebuilt from the CSV files.
+    """
+    global name_index
+    name_index = None
+    path_cache.clear()
+
+    if graph is not None:
+        people_rows, movie_rows, star_rows = list(people_rows), list(movie_rows), list(star_rows)
+        if graph.ingest(people_rows, movie_rows, star_rows) and graph.snapshot_path is not None:
+            try:
+                append_journal(graph, people_rows, movie_rows, star_rows)
+            except OSError:
+                # read-only data directory, the rows are only kept in memory
+                pass
+        return
+
+    for row in people_rows:
+        if row["id"] in people:
+            continue
+        people[row["id"]] = {
+            "name": row["name"],
+            "birth": row["birth"],
+            "movies": set()
+        }
+        names.setdefault(row["name"].lower(), set()).add(row["id"])
+
+    for row in movie_rows:
+        if row["id"] in movies:
+            continue
+        movies[row["id"]] = {
+            "title": row["title"],
+            "year": row["year"],
+            "stars": set()
+        }
+
+    for row in star_rows:
+        try:
+            people[row["person_id"]]["movies"].add(row["movie_id"])
+            movies[row["movie_id"]]["stars"].add(row["person_id"])
+        except KeyError:
+            pass
+
+
+def refresh_data(directory):
+    """
+    Brings the loaded data up to date with the CSV files in `directory`.
+    Rows appended to the files since they were loaded are ingested,
+    reading only the new bytes; any other change reloads everything.
+    """
+    global data_key, name_index
+    if graph is not None:
+        if catch_up(graph, directory):
+            name_index = None
+            path_cache.clear()
+            return
+        load_data(directory, snapshot=graph.snapshot_path is not None, compact=True)
+        return
+
+    key = snapshot_key(directory)
+    old = {name: (mtime, size) for name, mtime, size in data_key or []}
+    tails = []
+    for name, mtime, size in key:
+        old_mtime, old_size = old.get(name, (None, -1))
+        if size < old_size or old_size < 0 or (size == old_size and mtime != old_mtime):
+            load_data(directory)
+            return
+        tails.append(read_csv_tail(f"{directory}/{name}", old_size))
+    ingest(*tails)
+    data_key = key
+
+
 def main():
     if len(sys.argv) > 2:
         sys.exit("Usage: python degrees.py [directory]")
@@ -59,7 +244,7 @@ def main():
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, snapshot=True)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -69,7 +254,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path_bidirectional(source, target)
 
     if path is None:
         print("Not connected.")
@@ -91,51 +276,184 @@ def shortest_path(source, target):
 
     If no possible path, returns None.
     """
-    path = []
-    explored_states = []
+    if graph is not None:
+        return graph.shortest_path(source, target)
+    if source == target:
+        return []
 
-    # using Breadth First Search
-    start = Node(source, None, None)
-    frontier = QueueFrontier()
-    frontier.add(start)
+    # maps every person already reached (explored or waiting in the
+    # frontier) to the (movie_id, person_id) pair it was reached from
+    parents = {source: None}
 
-    while True:
-        if frontier.empty():
-            return None
+    # using Breadth First Search
+    frontier = deque([source])
 
+    while frontier:
         # explore a node
-        node = frontier.remove()
-        explored_states.append(node.state)
+        person_id = frontier.popleft()
 
         # adding nodes to the frontier
-        neighborhood = neighbors_for_person(node.state)
-        for neighbor in neighborhood:
-            (movie_id, person_id) = neighbor
-
-            # ignore a pair if:
-            # - person is the same of current node
-            # - person already has been explored
-            if person_id == node.state or person_id in explored_states:
+        for movie_id, neighbor_id in neighbors_for_person(person_id):
+            # ignore people already reached, they are explored
+            # or in the frontier with a path at least as short
+            if neighbor_id in parents:
                 continue
+            parents[neighbor_id] = (movie_id, person_id)
 
-            # create a new node
-            new_node = Node(person_id, node, movie_id)
-            
             # check if new node is the target
-            if new_node.state == target:
-                node = new_node
-                while node.parent is not None:
-                    # append movie/star pairs to the path list
-                    path.append((node.action, node.state))
-                    node = node.parent
-                
-                # reversing the list and returning the result
-                path.reverse()
-                return path
+            if neighbor_id == target:
+                return _path_to(target, parents)
 
             # if not, add the node to the frontier
-            frontier.add(new_node)
+            frontier.append(neighbor_id)
 
+    return None
+
+
+def cached_shortest_path(source, target):
+    """
+    Same as shortest_path, answered from `path_cache` when possible.
+    """
+    return path_cache.get(source, target)
+
+
+def reverse_path(source, path):
+    """
+    Returns the (movie_id, person_id) path from the last person of a
+    path starting at `source` back to `source`.
+    """
+    if path is None:
+        return None
+    people_on_path = [source] + [person_id for _, person_id in path[:-1]]
+    return [(movie_id, person_id)
+            for (movie_id, _), person_id in zip(reversed(path), reversed(people_on_path))]
+
+
+def bfs_layers(source):
+    """
+    Runs a single Breadth First Search from `source` over the whole graph.
+
+    Returns two dictionaries over every person reachable from the source:
+    `distances` maps them to their degrees of separation, and `parents`
+    maps them to the (movie_id, person_id) pair they were reached from
+    (None for the source), so any shortest path can be rebuilt with
+    `path_from_layers`.
+    """
+    if graph is not None:
+        return graph.bfs_layers(source)
+
+    distances = {source: 0}
+    parents = {source: None}
+    frontier = deque([source])
+    while frontier:
+        person_id = frontier.popleft()
+        for movie_id, neighbor_id in neighbors_for_person(person_id):
+            if neighbor_id in parents:
+                continue
+            parents[neighbor_id] = (movie_id, person_id)
+            distances[neighbor_id] = distances[person_id] + 1
+            frontier.append(neighbor_id)
+    return distances, parents
+
+
+def path_from_layers(target, parents):
+    """
+    Returns the (movie_id, person_id) path from the source of a
+    `bfs_layers` search to the target, or None if it wasn't reached.
+    """
+    if target not in parents:
+        return None
+    return _path_to(target, parents)
+
+
+def _path_to(person_id, parents):
+    """
+    Follows parent pointers back from `person_id` to the start
+    of the search, returning the (movie_id, person_id) path.
+    """
+    path = []
+    while parents[person_id] is not None:
+        movie_id, parent_id = parents[person_id]
+        # append movie/star pairs to the path list
+        path.append((movie_id, person_id))
+        person_id = parent_id
+
+    # reversing the list and returning the result
+    path.reverse()
+    return path
+
+
+def shortest_path_bidirectional(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching from both
+    ends at once and meeting in the middle.
+
+    If no possible path, returns None.
+    """
+    if graph is not None:
+        return graph.shortest_path(source, target)
+    if source == target:
+        return []
+
+    # every reached person maps to the (movie_id, person_id) pair
+    # that leads one step back towards the side it was reached from
+    forward_parents = {source: None}
+    backward_parents = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+        # always expand the smaller side, one whole layer at a time
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meetings = _expand_layer(
+                forward_frontier, forward_parents, backward_parents)
+        else:
+            backward_frontier, meetings = _expand_layer(
+                backward_frontier, backward_parents, forward_parents)
+
+        if meetings:
+            # every meeting found in the same layer may have a different
+            # length on the other side, so keep the shortest one
+            paths = [_join_paths(person_id, forward_parents, backward_parents)
+                     for person_id in meetings]
+            return min(paths, key=len)
+
+    return None
+
+
+def _expand_layer(frontier, parents, other_parents):
+    """
+    Expands every person in `frontier` by one step, recording parents.
+    Returns the next layer and the people also reached by the other side.
+    """
+    next_frontier = []
+    meetings = []
+    for person_id in frontier:
+        for movie_id, neighbor_id in neighbors_for_person(person_id):
+            if neighbor_id in parents:
+                continue
+            parents[neighbor_id] = (movie_id, person_id)
+            if neighbor_id in other_parents:
+                meetings.append(neighbor_id)
+            next_frontier.append(neighbor_id)
+    return next_frontier, meetings
+
+
+def _join_paths(meeting_id, forward_parents, backward_parents):
+    """
+    Builds the (movie_id, person_id) path from the source to the target
+    going through the person where both searches met.
+    """
+    # walk back from the meeting point to the source
+    path = _path_to(meeting_id, forward_parents)
+
+    # walk forward from the meeting point to the target
+    person_id = meeting_id
+    while backward_parents[person_id] is not None:
+        movie_id, person_id = backward_parents[person_id]
+        path.append((movie_id, person_id))
+    return path
 
 
 def person_id_for_name(name):
@@ -164,11 +482,34 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def person_candidates(name, limit=10):
+    """
+    Returns up to `limit` people whose names best match a partial
+    or misspelled `name`, as dictionaries with their id, name, birth
+    and movie count.
+    """
+    global name_index
+    if name_index is None:
+        if graph is not None:
+            name_index = NameIndex(graph.person_ids, graph.person_names, graph.person_births,
+                                   [len(graph.movies_of(person))
+                                    for person in range(len(graph.person_ids))])
+        else:
+            person_ids = list(people)
+            name_index = NameIndex(person_ids,
+                                   [people[person_id]["name"] for person_id in person_ids],
+                                   [people[person_id]["birth"] for person_id in person_ids],
+                                   [len(people[person_id]["movies"]) for person_id in person_ids])
+    return name_index.search(name, limit)
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,932 @@
+"""
+Compact integer-indexed graph for the degrees dataset.
+
+People and movies are interned to dense integers, and the bipartite
+star graph is stored twice as compressed sparse rows (CSR): for person
+`p`, the movies it starred in are
+`person_movies[person_offsets[p]:person_offsets[p + 1]]`, and for movie
+`m`, its stars are `movie_stars[movie_offsets[m]:movie_offsets[m + 1]]`.
+
+The graph can be saved to a versioned binary snapshot and memory-mapped
+back, so later runs skip parsing the CSV files and several processes can
+share the same pages.
+
+Rows added after the graph was built are kept beside the CSR arrays, and
+appended to a journal next to the snapshot that is replayed when it is
+mapped. The CSV files are assumed to only grow by appending rows, so
+when they grew the snapshot catches up by reading just the new bytes.
+"""
+
+import bisect
+import csv
+import io
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections import ChainMap
+from collections.abc import Mapping, Sequence
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks on this platform, journal writers must not overlap
+    fcntl = None
+
+# Typecode of the integer arrays, a signed 64-bit integer
+INDEX_TYPE = "q"
+
+# Snapshot file name, written next to the CSV files
+SNAPSHOT_NAME = "degrees.snapshot"
+
+# Bump whenever the snapshot layout changes, so old files are rebuilt
+SNAPSHOT_VERSION = 1
+
+# magic, version, number of sections, length of the key
+SNAPSHOT_HEADER = struct.Struct("<8sIIQ")
+SNAPSHOT_MAGIC = b"DEGSNAP\0"
+
+# Offsets and bytes of six string tables, then seven arrays
+SNAPSHOT_SECTIONS = 19
+
+# Journal of rows added after the snapshot was written, one JSON line per batch
+JOURNAL_SUFFIX = ".journal"
+
+# Journal size past which loading folds it into a new snapshot
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+# CSV files the snapshot is built from
+CSV_FILES = ("people.csv", "movies.csv", "stars.csv")
+
+
+class CompactGraph():
+    """
+    Bipartite people/movies graph stored as integer CSR arrays.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 person_index=None, movie_index=None, name_order=None):
+
+        # Index -> IMDb id, name and birth of every person
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+
+        # Index -> IMDb id, title and year of every movie
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+
+        # CSR adjacency in both directions
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        # IMDb id -> index
+        if person_index is None:
+            person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        if movie_index is None:
+            movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.person_index = person_index
+        self.movie_index = movie_index
+
+        # Person indexes sorted by lowercase name, used by NamesView
+        if name_order is None:
+            name_order = array(INDEX_TYPE, sorted(range(len(person_names)),
+                                                  key=lambda i: person_names[i].lower()))
+        self.name_order = name_order
+
+        # Rows added by ingest(), beside the CSR arrays built at first
+        self.base_people = len(person_offsets) - 1
+        self.base_movies = len(movie_offsets) - 1
+        self.extra_movies = {}
+        self.extra_stars = {}
+        self.extra_names = {}
+
+        # Snapshot this graph was mapped from, and the CSV files it matches
+        self.snapshot_path = None
+        self.snapshot_key = None
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Builds the graph straight from the CSV files in `directory`,
+        without going through the dictionaries used by degrees.py.
+        """
+        key = snapshot_key(directory)
+        person_ids, person_names, person_births = [], [], []
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                person_births.append(row["birth"])
+
+        movie_ids, movie_titles, movie_years = [], [], []
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                movie_ids.append(row["id"])
+                movie_titles.append(row["title"])
+                movie_years.append(row["year"])
+
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        edges = []
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                # rows pointing to unknown people or movies are ignored
+                person = person_index.get(row["person_id"])
+                movie = movie_index.get(row["movie_id"])
+                if person is not None and movie is not None:
+                    edges.append((person, movie))
+
+        graph = cls(person_ids, person_names, person_births,
+                    movie_ids, movie_titles, movie_years,
+                    *build_csr(len(person_ids), len(movie_ids), edges))
+        graph.snapshot_key = key
+        return graph
+
+    @classmethod
+    def from_data(cls, people, movies):
+        """
+        Builds the graph from the `people` and `movies` dictionaries
+        loaded by degrees.py.
+        """
+        person_ids = list(people)
+        movie_ids = list(movies)
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        edges = []
+        for person, person_id in enumerate(person_ids):
+            for movie_id in people[person_id]["movies"]:
+                edges.append((person, movie_index[movie_id]))
+
+        return cls(person_ids,
+                   [people[person_id]["name"] for person_id in person_ids],
+                   [people[person_id]["birth"] for person_id in person_ids],
+                   movie_ids,
+                   [movies[movie_id]["title"] for movie_id in movie_ids],
+                   [movies[movie_id]["year"] for movie_id in movie_ids],
+                   *build_csr(len(person_ids), len(movie_ids), edges))
+
+    def ingest(self, people_rows=(), movie_rows=(), star_rows=()):
+        """
+        Adds people, movies and stars rows, shaped like the rows of the
+        CSV files, without rebuilding the CSR arrays. Rows already known
+        are ignored, as are stars of unknown people or movies.
+
+        Returns True if the graph changed.
+        """
+        changed = False
+        for row in people_rows:
+            if row["id"] in self.person_index:
+                continue
+            person = self._append_person(row)
+            self.extra_names.setdefault(row["name"].lower(), []).append(person)
+            changed = True
+
+        for row in movie_rows:
+            if row["id"] in self.movie_index:
+                continue
+            self._append_movie(row)
+            changed = True
+
+        for row in star_rows:
+            person = self.person_index.get(row["person_id"])
+            movie = self.movie_index.get(row["movie_id"])
+            if person is None or movie is None or movie in self.movies_of(person):
+                continue
+            self.extra_movies.setdefault(person, []).append(movie)
+            self.extra_stars.setdefault(movie, []).append(person)
+            changed = True
+        return changed
+
+    def _append_person(self, row):
+        """
+        Appends a person row, returning its new index.
+        """
+        self._make_growable()
+        person = len(self.person_ids)
+        self.person_ids.append(row["id"])
+        self.person_names.append(row["name"])
+        self.person_births.append(row["birth"])
+        self.person_index[row["id"]] = person
+        return person
+
+    def _append_movie(self, row):
+        """
+        Appends a movie row, returning its new index.
+        """
+        self._make_growable()
+        movie = len(self.movie_ids)
+        self.movie_ids.append(row["id"])
+        self.movie_titles.append(row["title"])
+        self.movie_years.append(row["year"])
+        self.movie_index[row["id"]] = movie
+        return movie
+
+    def _make_growable(self):
+        """
+        Wraps read-only tables, such as the ones mapped from a snapshot,
+        so rows can be appended to them.
+        """
+        for name in ("person_ids", "person_names", "person_births",
+                     "movie_ids", "movie_titles", "movie_years"):
+            table = getattr(self, name)
+            if not isinstance(table, (list, GrowableSequence)):
+                setattr(self, name, GrowableSequence(table))
+        for name in ("person_index", "movie_index"):
+            index = getattr(self, name)
+            if not isinstance(index, (dict, ChainMap)):
+                setattr(self, name, ChainMap({}, index))
+
+    def movies_of(self, person):
+        """
+        Returns the movie indexes a person index starred in.
+        """
+        if person < self.base_people:
+            movies = self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+        else:
+            movies = ()
+        if person in self.extra_movies:
+            return list(movies) + self.extra_movies[person]
+        return movies
+
+    def stars_of(self, movie):
+        """
+        Returns the person indexes that starred in a movie index.
+        """
+        if movie < self.base_movies:
+            stars = self.movie_stars[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+        else:
+            stars = ()
+        if movie in self.extra_stars:
+            return list(stars) + self.extra_stars[movie]
+        return stars
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        movie_ids = self.movie_ids
+        person_ids = self.person_ids
+        neighbors = set()
+        for movie in self.movies_of(self.person_index[person_id]):
+            for person in self.stars_of(movie):
+                neighbors.add((movie_ids[movie], person_ids[person]))
+        return neighbors
+
+    def shortest_path(self, source_id, target_id):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, running a bidirectional
+        BFS directly on the integer arrays.
+
+        If no possible path, returns None.
+        """
+        source = self.person_index[source_id]
+        target = self.person_index[target_id]
+        if source == target:
+            return []
+
+        # reached person -> (movie, person) one step back towards its side
+        forward_parents = {source: None}
+        backward_parents = {target: None}
+        forward_frontier = [source]
+        backward_frontier = [target]
+
+        while forward_frontier and backward_frontier:
+            # always expand the smaller side, one whole layer at a time
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meetings = self._expand_layer(
+                    forward_frontier, forward_parents, backward_parents)
+            else:
+                backward_frontier, meetings = self._expand_layer(
+                    backward_frontier, backward_parents, forward_parents)
+
+            if meetings:
+                paths = [self._join_paths(person, forward_parents, backward_parents)
+                         for person in meetings]
+                return min(paths, key=len)
+
+        return None
+
+    def bfs_layers(self, source_id):
+        """
+        Runs a single BFS from `source_id` over the whole graph.
+
+        Returns the `distances` and `parents` dictionaries, keyed by
+        person_id, described in degrees.bfs_layers.
+        """
+        source = self.person_index[source_id]
+        parents = {source: None}
+        distances = {source: 0}
+        frontier = [source]
+        distance = 0
+        while frontier:
+            distance += 1
+            frontier, _ = self._expand_layer(frontier, parents, ())
+            for person in frontier:
+                distances[person] = distance
+
+        movie_ids = self.movie_ids
+        person_ids = self.person_ids
+        id_parents = {}
+        for person, parent in parents.items():
+            if parent is not None:
+                parent = (movie_ids[parent[0]], person_ids[parent[1]])
+            id_parents[person_ids[person]] = parent
+        id_distances = {person_ids[person]: distance for person, distance in distances.items()}
+        return id_distances, id_parents
+
+    def _expand_layer(self, frontier, parents, other_parents):
+        """
+        Expands every person index in `frontier` by one step.
+        Returns the next layer and the people also reached by the other side.
+        """
+        if self.extra_movies:
+            return self._expand_layer_with_ingested(frontier, parents, other_parents)
+
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        next_frontier = []
+        meetings = []
+        for person in frontier:
+            # walk the CSR rows by index, without building neighbor sets
+            for i in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[i]
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_stars[j]
+                    if neighbor in parents:
+                        continue
+                    parents[neighbor] = (movie, person)
+                    if neighbor in other_parents:
+                        meetings.append(neighbor)
+                    next_frontier.append(neighbor)
+        return next_frontier, meetings
+
+    def _expand_layer_with_ingested(self, frontier, parents, other_parents):
+        """
+        Same as _expand_layer, also following the stars added by ingest().
+        """
+        next_frontier = []
+        meetings = []
+        for person in frontier:
+            for movie in self.movies_of(person):
+                for neighbor in self.stars_of(movie):
+                    if neighbor in parents:
+                        continue
+                    parents[neighbor] = (movie, person)
+                    if neighbor in other_parents:
+                        meetings.append(neighbor)
+                    next_frontier.append(neighbor)
+        return next_frontier, meetings
+
+    def _join_paths(self, meeting, forward_parents, backward_parents):
+        """
+        Builds the (movie_id, person_id) path from the source to the target
+        going through the person index where both searches met.
+        """
+        path = []
+        person = meeting
+        while forward_parents[person] is not None:
+            movie, parent = forward_parents[person]
+            path.append((movie, person))
+            person = parent
+        path.reverse()
+
+        person = meeting
+        while backward_parents[person] is not None:
+            movie, person = backward_parents[person]
+            path.append((movie, person))
+
+        return [(self.movie_ids[movie], self.person_ids[person]) for movie, person in path]
+
+
+class NamesView(Mapping):
+    """
+    Read-only `names` dictionary (lowercase name -> set of person_ids)
+    answered by binary search over the people sorted by name.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.sorted_names = SortedView(graph.person_names, graph.name_order, str.lower)
+
+    def __getitem__(self, name):
+        graph = self.graph
+        start = bisect.bisect_left(self.sorted_names, name)
+        end = bisect.bisect_right(self.sorted_names, name, start)
+        person_ids = {graph.person_ids[graph.name_order[i]] for i in range(start, end)}
+        for person in graph.extra_names.get(name, ()):
+            person_ids.add(graph.person_ids[person])
+        if not person_ids:
+            raise KeyError(name)
+        return person_ids
+
+    def __iter__(self):
+        previous = None
+        for name in self.sorted_names:
+            if name != previous:
+                yield name
+                previous = name
+        for name in self.graph.extra_names:
+            i = bisect.bisect_left(self.sorted_names, name)
+            if i == len(self.sorted_names) or self.sorted_names[i] != name:
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class PeopleView(Mapping):
+    """
+    Read-only `people` dictionary computed on demand from a CompactGraph.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person_index[person_id]
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {graph.movie_ids[movie] for movie in graph.movies_of(person)}
+        }
+
+    def __contains__(self, person_id):
+        return person_id in self.graph.person_index
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Read-only `movies` dictionary computed on demand from a CompactGraph.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie_index[movie_id]
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[person] for person in graph.stars_of(movie)}
+        }
+
+    def __contains__(self, movie_id):
+        return movie_id in self.graph.movie_index
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+def build_csr(person_count, movie_count, edges):
+    """
+    Builds both CSR directions from (person, movie) index pairs,
+    dropping duplicated pairs.
+
+    Returns person_offsets, person_movies, movie_offsets, movie_stars.
+    """
+    # sorting the packed pairs groups them by person, then by movie
+    keys = sorted({person * movie_count + movie for person, movie in edges})
+
+    person_offsets = array(INDEX_TYPE, bytes(8 * (person_count + 1)))
+    movie_offsets = array(INDEX_TYPE, bytes(8 * (movie_count + 1)))
+    person_movies = array(INDEX_TYPE, bytes(8 * len(keys)))
+    for i, key in enumerate(keys):
+        person, movie = divmod(key, movie_count)
+        person_offsets[person + 1] += 1
+        movie_offsets[movie + 1] += 1
+        person_movies[i] = movie
+
+    # turn row counts into offsets
+    for person in range(person_count):
+        person_offsets[person + 1] += person_offsets[person]
+    for movie in range(movie_count):
+        movie_offsets[movie + 1] += movie_offsets[movie]
+
+    # counting sort of the same pairs by movie
+    movie_stars = array(INDEX_TYPE, bytes(8 * len(keys)))
+    cursor = movie_offsets[:-1]
+    for key in keys:
+        person, movie = divmod(key, movie_count)
+        movie_stars[cursor[movie]] = person
+        cursor[movie] += 1
+
+    return person_offsets, person_movies, movie_offsets, movie_stars
+
+
+class StringTable(Sequence):
+    """
+    Sequence of strings stored as an offsets array into a UTF-8 buffer.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def encode(cls, strings):
+        """
+        Returns the offsets and buffer bytes storing `strings`.
+        """
+        offsets = array(INDEX_TYPE, [0])
+        blob = bytearray()
+        for string in strings:
+            blob += string.encode("utf-8")
+            offsets.append(len(blob))
+        return offsets.tobytes(), bytes(blob)
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class GrowableSequence(Sequence):
+    """
+    Read-only sequence with an appendable list of extra items after it.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.extra = []
+
+    def append(self, item):
+        self.extra.append(item)
+
+    def __getitem__(self, i):
+        if i < len(self.base):
+            return self.base[i]
+        return self.extra[i - len(self.base)]
+
+    def __len__(self):
+        return len(self.base) + len(self.extra)
+
+
+class SortedView(Sequence):
+    """
+    Sequence of `values` visited in `order`, optionally normalized,
+    so it can be binary searched with the bisect module.
+    """
+
+    def __init__(self, values, order, normalize=None):
+        self.values = values
+        self.order = order
+        self.normalize = normalize
+
+    def __getitem__(self, i):
+        value = self.values[self.order[i]]
+        return value if self.normalize is None else self.normalize(value)
+
+    def __len__(self):
+        return len(self.order)
+
+
+class SortedIndex(Mapping):
+    """
+    Read-only id -> index dictionary answered by binary search,
+    so a mapped snapshot does not need to build a dict at startup.
+    """
+
+    def __init__(self, values, order):
+        self.values = values
+        self.order = order
+        self.sorted_values = SortedView(values, order)
+
+    def __getitem__(self, key):
+        i = bisect.bisect_left(self.sorted_values, key)
+        if i == len(self.order) or self.sorted_values[i] != key:
+            raise KeyError(key)
+        return self.order[i]
+
+    def __iter__(self):
+        return iter(self.sorted_values)
+
+    def __len__(self):
+        return len(self.order)
+
+
+def snapshot_key(directory):
+    """
+    Returns the modification times and sizes of the CSV files,
+    which a snapshot must match to be used.
+    """
+    key = []
+    for name in CSV_FILES:
+        stat = os.stat(f"{directory}/{name}")
+        key.append([name, stat.st_mtime_ns, stat.st_size])
+    return key
+
+
+def save_snapshot(graph, path, key):
+    """
+    Writes `graph` to a binary snapshot at `path`, tagged with `key`,
+    and drops the journal of the snapshot it replaces.
+    """
+    if (graph.extra_movies or len(graph.person_ids) > graph.base_people
+            or len(graph.movie_ids) > graph.base_movies):
+        # fold ingested rows into fresh CSR arrays
+        edges = [(person, movie) for person in range(len(graph.person_ids))
+                 for movie in graph.movies_of(person)]
+        graph = CompactGraph(list(graph.person_ids), list(graph.person_names),
+                             list(graph.person_births), list(graph.movie_ids),
+                             list(graph.movie_titles), list(graph.movie_years),
+                             *build_csr(len(graph.person_ids), len(graph.movie_ids), edges))
+
+    sections = []
+    for strings in (graph.person_ids, graph.person_names, graph.person_births,
+                    graph.movie_ids, graph.movie_titles, graph.movie_years):
+        sections.extend(StringTable.encode(strings))
+    for values in (graph.person_offsets, graph.person_movies,
+                   graph.movie_offsets, graph.movie_stars, graph.name_order):
+        sections.append(bytes(values))
+    for ids in (graph.person_ids, graph.movie_ids):
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        sections.append(array(INDEX_TYPE, order).tobytes())
+
+    key = json.dumps(key).encode("utf-8")
+    position = _align(SNAPSHOT_HEADER.size + len(key) + 16 * len(sections))
+    table = array(INDEX_TYPE)
+    for section in sections:
+        table.extend((position, len(section)))
+        position = _align(position + len(section))
+
+    # write to a temporary file first, so readers never see half a snapshot
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(sections), len(key)))
+        f.write(key)
+        f.write(table.tobytes())
+        for i, section in enumerate(sections):
+            f.write(bytes(table[2 * i] - f.tell()))
+            f.write(section)
+        # on disk before it replaces the old snapshot, even if the system crashes
+        f.flush()
+        os.fsync(f.fileno())
+
+    # drop the old journal first: if we stop before replacing the snapshot,
+    # the old one just catches up from the CSV files again
+    try:
+        os.remove(path + JOURNAL_SUFFIX)
+    except FileNotFoundError:
+        pass
+    os.replace(temporary, path)
+
+
+def map_snapshot(path):
+    """
+    Memory-maps the snapshot at `path` and returns its CompactGraph,
+    with the rows of its journal replayed.
+
+    Returns None if there is no snapshot, if it has another version,
+    or if it is cut short or inconsistent.
+    """
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(buffer)
+    if len(view) < SNAPSHOT_HEADER.size:
+        return None
+    magic, version, count, key_length = SNAPSHOT_HEADER.unpack_from(view)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    start = SNAPSHOT_HEADER.size
+    if count != SNAPSHOT_SECTIONS or start + key_length + 16 * count > len(view):
+        return None
+    try:
+        key = json.loads(str(view[start:start + key_length], "utf-8"))
+    except ValueError:
+        return None
+
+    # memoryview slices stop quietly at the end of the mapping,
+    # so check every section is really there
+    table = view[start + key_length:start + key_length + 16 * count].cast(INDEX_TYPE)
+    for i in range(count):
+        offset, length = table[2 * i], table[2 * i + 1]
+        if offset < 0 or length < 0 or offset + length > len(view):
+            return None
+        # every section but the string buffers is an array of INDEX_TYPE
+        if (i >= 12 or i % 2 == 0) and length % table.itemsize:
+            return None
+    sections = [view[table[2 * i]:table[2 * i] + table[2 * i + 1]] for i in range(count)]
+    strings = [StringTable(sections[i].cast(INDEX_TYPE), sections[i + 1])
+               for i in range(0, 12, 2)]
+    arrays = [section.cast(INDEX_TYPE) for section in sections[12:]]
+    if not _consistent(strings, arrays):
+        return None
+    person_ids, movie_ids = strings[0], strings[3]
+
+    graph = CompactGraph(*strings, *arrays[:4],
+                         person_index=SortedIndex(person_ids, arrays[5]),
+                         movie_index=SortedIndex(movie_ids, arrays[6]),
+                         name_order=arrays[4])
+    # keep the mapping open for as long as the graph lives
+    graph.buffer = buffer
+    graph.snapshot_path = path
+    graph.snapshot_key = key
+
+    try:
+        with open(path + JOURNAL_SUFFIX, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    batch = json.loads(line)
+                    rows = batch["people"], batch["movies"], batch["stars"]
+                    key = batch["key"]
+                except (ValueError, KeyError, TypeError):
+                    # still being appended by another process, or torn by a
+                    # crash: stop here and leave the file to the writers, the
+                    # rows are read from the CSV files again by catch_up
+                    break
+                graph.ingest(*rows)
+                graph.snapshot_key = key
+    except FileNotFoundError:
+        pass
+    return graph
+
+
+def _consistent(strings, arrays):
+    """
+    Returns True if the string tables and arrays of a snapshot
+    have the lengths the people and movies they describe call for.
+    """
+    for table in strings:
+        if len(table.offsets) == 0 or table.offsets[-1] != len(table.blob):
+            return False
+    people, movies = len(strings[0]), len(strings[3])
+    if any(len(table) != people for table in strings[:3]):
+        return False
+    if any(len(table) != movies for table in strings[3:]):
+        return False
+
+    person_offsets, person_movies, movie_offsets, movie_stars, name_order, \
+        person_order, movie_order = arrays
+    return (len(person_offsets) == people + 1 and person_offsets[-1] == len(person_movies)
+            and len(movie_offsets) == movies + 1 and movie_offsets[-1] == len(movie_stars)
+            and len(name_order) == people and len(person_order) == people
+            and len(movie_order) == movies)
+
+
+def append_journal(graph, people_rows, movie_rows, star_rows):
+    """
+    Records rows ingested by a mapped graph in its snapshot journal,
+    so they are replayed the next time the snapshot is mapped.
+    """
+    batch = {"key": graph.snapshot_key, "people": list(people_rows),
+             "movies": list(movie_rows), "stars": list(star_rows)}
+    line = (json.dumps(batch) + "\n").encode("utf-8")
+
+    fd = os.open(graph.snapshot_path + JOURNAL_SUFFIX, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        # one writer at a time; the lock goes with the descriptor
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        _repair_journal(fd)
+        written = os.write(fd, line)
+        # a regular file only takes less on a full disk or a signal
+        while written < len(line):
+            written += os.write(fd, line[written:])
+    finally:
+        os.close(fd)
+
+
+def _repair_journal(fd):
+    """
+    Cuts off the end of a journal left without a newline by a writer
+    that crashed, so the next batch starts on a line of its own.
+    Only called by a writer holding the journal lock.
+    """
+    end = os.fstat(fd).st_size
+    if end == 0 or os.pread(fd, 1, end - 1) == b"\n":
+        return
+    position = end
+    while position > 0:
+        start = max(position - 65536, 0)
+        newline = os.pread(fd, position - start, start).rfind(b"\n")
+        if newline >= 0:
+            os.ftruncate(fd, start + newline + 1)
+            return
+        position = start
+    os.ftruncate(fd, 0)
+
+
+def catch_up(graph, directory):
+    """
+    Ingests the rows appended to the CSV files in `directory` since
+    `graph` was last in sync with them, reading only the new bytes.
+
+    Returns False if the CSV files changed in some other way, in which
+    case the graph must be rebuilt.
+    """
+    key = snapshot_key(directory)
+    if graph.snapshot_key == key:
+        return True
+    if graph.snapshot_key is None:
+        return False
+
+    old = {name: (mtime, size) for name, mtime, size in graph.snapshot_key}
+    tails = []
+    for name, mtime, size in key:
+        if name not in old:
+            return False
+        old_mtime, old_size = old[name]
+        if size < old_size or (size == old_size and mtime != old_mtime):
+            return False
+        tails.append(read_csv_tail(f"{directory}/{name}", old_size))
+
+    graph.ingest(*tails)
+    graph.snapshot_key = key
+    if graph.snapshot_path is not None:
+        try:
+            append_journal(graph, *tails)
+        except OSError:
+            # read-only data directory, the rows are only kept in memory
+            pass
+    return True
+
+
+def compact_snapshot(graph):
+    """
+    Rewrites the snapshot of a mapped graph with the rows of its journal
+    folded in, so they are no longer replayed at every load.
+
+    Returns the graph mapped from the new snapshot, or `graph` itself
+    if the snapshot can't be written.
+    """
+    try:
+        save_snapshot(graph, graph.snapshot_path, graph.snapshot_key)
+    except OSError:
+        return graph
+    return map_snapshot(graph.snapshot_path) or graph
+
+
+def read_csv_tail(path, offset):
+    """
+    Returns the rows of a CSV file that start at byte `offset`,
+    as dictionaries keyed by the header of the file.
+    """
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]))
+        f.seek(max(offset, f.tell()))
+        tail = f.read().decode("utf-8")
+    return list(csv.DictReader(io.StringIO(tail), fieldnames=header))
+
+
+def load_snapshot(directory):
+    """
+    Returns the CompactGraph for the CSV files in `directory`,
+    memory-mapped from its snapshot. If rows were appended to the CSV
+    files, only those are read; otherwise the snapshot is (re)built
+    first if it is missing or out of date.
+    """
+    path = f"{directory}/{SNAPSHOT_NAME}"
+    graph = map_snapshot(path)
+    if graph is not None and catch_up(graph, directory):
+        try:
+            journal_size = os.path.getsize(path + JOURNAL_SUFFIX)
+        except OSError:
+            journal_size = 0
+        if journal_size > JOURNAL_COMPACT_BYTES:
+            graph = compact_snapshot(graph)
+        return graph
+
+    key = snapshot_key(directory)
+    graph = CompactGraph.from_csv(directory)
+    try:
+        save_snapshot(graph, path, key)
+    except OSError:
+        # read-only data directory, keep the graph in memory
+        return graph
+    return map_snapshot(path) or graph
+
+
+def _align(position):
+    """
+    Rounds `position` up to a multiple of 8 bytes.
+    """
+    return (position + 7) // 8 * 8
@@ -0,0 +1,241 @@
+"""
+m,n,k-game player: k in a row on a board of any size
+
+Boards are lists of lists of X, O and EMPTY like in tictactoe.py, with
+any number of rows and columns. Larger boards can't be solved, so
+best_move runs an iterative deepening alpha-beta search that scores
+the leaves with a heuristic, and answers within a time budget.
+"""
+
+from functools import lru_cache
+import math
+import time
+
+from tictactoe import X, O, EMPTY, player
+
+# Score of a won position, larger than any heuristic score
+WIN = 10 ** 9
+
+# The four directions a line can run in: row, column and both diagonals
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+# Boards with fewer cells consider every empty cell as a move
+NEIGHBORHOOD_MIN_CELLS = 16
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget runs out.
+    """
+
+
+def initial_state(rows=3, columns=3):
+    """
+    Returns starting state of a board with the given size.
+    """
+    return [[EMPTY] * columns for _ in range(rows)]
+
+
+def actions(board):
+    """
+    Returns set of all possible actions (i, j) available on the board.
+    """
+    return {(row, column)
+            for row in range(len(board))
+            for column in range(len(board[row]))
+            if board[row][column] == EMPTY}
+
+
+def result(board, action):
+    """
+    Returns the board that results from making move (i, j) on the board.
+    """
+    (row, column) = action
+    if board[row][column] != EMPTY:
+        raise IndexError
+    copy_of_board = [list(board_row) for board_row in board]
+    copy_of_board[row][column] = player(board)
+    return copy_of_board
+
+
+def winner(board, k=3):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    for window in windows(len(board), len(board[0]), k):
+        (row, column) = window[0]
+        mark = board[row][column]
+        if mark != EMPTY and all(board[i][j] == mark for i, j in window):
+            return mark
+    return None
+
+
+def terminal(board, k=3):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    if winner(board, k) is not None:
+        return True
+    return all(cell != EMPTY for row in board for cell in row)
+
+
+def wins_through(board, row, column, k):
+    """
+    Returns True if the mark at (row, column) is part of k in a row.
+    """
+    mark = board[row][column]
+    rows, columns = len(board), len(board[0])
+    for d_row, d_column in DIRECTIONS:
+        count = 1
+        for sign in (1, -1):
+            i, j = row + sign * d_row, column + sign * d_column
+            while 0 <= i < rows and 0 <= j < columns and board[i][j] == mark:
+                count += 1
+                i, j = i + sign * d_row, j + sign * d_column
+        if count >= k:
+            return True
+    return False
+
+
+@lru_cache(maxsize=None)
+def windows(rows, columns, k):
+    """
+    Returns every run of k cells in a line on a board of the given size.
+    """
+    runs = []
+    for row in range(rows):
+        for column in range(columns):
+            for d_row, d_column in DIRECTIONS:
+                end_row = row + d_row * (k - 1)
+                end_column = column + d_column * (k - 1)
+                if 0 <= end_row < rows and 0 <= end_column < columns:
+                    runs.append(tuple((row + d_row * i, column + d_column * i) for i in range(k)))
+    return runs
+
+
+def evaluate(board, k=3):
+    """
+    Heuristic value of a position without a winner, from X's point of view:
+    every run of k cells still open to only one player counts for that
+    player, much more the more of it is already filled.
+    """
+    score = 0
+    for window in windows(len(board), len(board[0]), k):
+        x_count = 0
+        o_count = 0
+        for i, j in window:
+            if board[i][j] == X:
+                x_count += 1
+            elif board[i][j] == O:
+                o_count += 1
+        if x_count and not o_count:
+            score += 4 ** x_count
+        elif o_count and not x_count:
+            score -= 4 ** o_count
+    return score
+
+
+def candidate_moves(board):
+    """
+    Returns the moves worth searching, closest to the center first.
+    On large boards these are only the empty cells next to a taken one
+    (or every cell on an empty board), as moves far from any mark are
+    almost never better.
+    """
+    rows, columns = len(board), len(board[0])
+    center_row, center_column = (rows - 1) / 2, (columns - 1) / 2
+    empty = actions(board)
+    if NEIGHBORHOOD_MIN_CELLS <= rows * columns and len(empty) < rows * columns:
+        empty = {(row, column) for row, column in empty
+                 if any(board[i][j] != EMPTY
+                        for i in range(max(row - 1, 0), min(row + 2, rows))
+                        for j in range(max(column - 1, 0), min(column + 2, columns)))}
+    return sorted(empty, key=lambda cell: (abs(cell[0] - center_row) + abs(cell[1] - center_column), cell))
+
+
+def best_move(board, k=3, time_budget=1.0, max_depth=None):
+    """
+    Returns the best action found for the current player within
+    `time_budget` seconds, searching one ply deeper at a time and
+    keeping the answer of the deepest search that finished.
+    """
+    # the search makes and undoes moves on its own copy of the board
+    board = [list(row) for row in board]
+    moves = candidate_moves(board)
+    if not moves or winner(board, k) is not None:
+        return None
+
+    deadline = time.perf_counter() + time_budget
+    sign = 1 if player(board) == X else -1
+    if max_depth is None:
+        max_depth = len(actions(board))
+
+    next_move = moves[0]
+    for depth in range(1, max_depth + 1):
+        try:
+            value, move = _search_root(board, k, moves, depth, sign, deadline)
+        except SearchTimeout:
+            break
+        next_move = move
+        # try the best move of this depth first in the next one
+        moves.remove(move)
+        moves.insert(0, move)
+        if abs(value) >= WIN:
+            # forced win or loss found, deeper search won't change it
+            break
+    return next_move
+
+
+def _search_root(board, k, moves, depth, sign, deadline):
+    """
+    Returns the best value and move for the current player, searching
+    `depth` plies. Values are from the current player's point of view.
+    """
+    mark = player(board)
+    alpha = -math.inf
+    next_move = moves[0]
+    for row, column in moves:
+        board[row][column] = mark
+        try:
+            value = -_negamax(board, k, depth - 1, -math.inf, -alpha, -sign, deadline, row, column)
+        finally:
+            board[row][column] = EMPTY
+        if value > alpha:
+            alpha = value
+            next_move = (row, column)
+    return alpha, next_move
+
+
+def _negamax(board, k, depth, alpha, beta, sign, deadline, last_row, last_column):
+    """
+    Alpha-beta search in negamax form: returns the value of the board for
+    the player to move, whose sign is `sign` (1 for X, -1 for O), given
+    the last move was made at (last_row, last_column).
+    """
+    if time.perf_counter() > deadline:
+        raise SearchTimeout
+
+    # the last move is the only one that could have won the game;
+    # earlier wins score higher
+    if wins_through(board, last_row, last_column, k):
+        return -(WIN + depth)
+    moves = candidate_moves(board)
+    if not moves:
+        return 0
+    if depth == 0:
+        return sign * evaluate(board, k)
+
+    mark = X if sign == 1 else O
+    value = -math.inf
+    for row, column in moves:
+        # moves are made and undone in place, so the search allocates no boards
+        board[row][column] = mark
+        try:
+            value = max(value, -_negamax(board, k, depth - 1, -beta, -alpha, -sign,
+                                         deadline, row, column))
+        finally:
+            board[row][column] = EMPTY
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            break
+    return value
@@ -0,0 +1,178 @@
+"""
+Prefix and trigram index over people's names, used to suggest people
+for partial or misspelled names.
+"""
+
+import bisect
+import heapq
+from array import array
+from collections import Counter
+
+# How many of a query's rarest trigrams are used to gather fuzzy candidates
+RARE_TRIGRAMS = 4
+
+# Upper bound on the names examined for a single query
+MAX_CANDIDATES = 2000
+
+# How many of the fuzzy candidates sharing most trigrams get scored
+SCORED_CANDIDATES = 200
+
+# People kept for prefixes of more than MAX_CANDIDATES names,
+# the most results a search for such a prefix can return
+POPULAR_RESULTS = 100
+
+# Kinds of match, in ranking order
+EXACT, PREFIX, FUZZY = 0, 1, 2
+
+
+class NameIndex():
+    """
+    Ranked name lookup: exact matches first, then names starting with
+    the query, then names sharing the most trigrams with it. Ties are
+    broken by how many movies the person starred in.
+    """
+
+    def __init__(self, person_ids, names, births, movie_counts):
+        self.person_ids = person_ids
+        self.names = names
+        self.births = births
+        self.movie_counts = movie_counts
+
+        # distinct lowercase names, sorted for prefix search, and the
+        # people indexes sharing each of them, most movies first
+        people_by_key = {}
+        for person, name in enumerate(names):
+            people_by_key.setdefault(normalize(name), []).append(person)
+        self.keys = sorted(people_by_key)
+        self.people = [sorted(people_by_key[key], key=lambda person: (-movie_counts[person], person))
+                       for key in self.keys]
+
+        # trigram -> positions in self.keys of the names containing it
+        postings = {}
+        for position, key in enumerate(self.keys):
+            for trigram in trigrams(key):
+                postings.setdefault(trigram, []).append(position)
+        self.postings = {trigram: array("l", positions)
+                         for trigram, positions in postings.items()}
+
+        # prefix -> positions in self.keys of the names of the people with
+        # most movies among those starting with it, for every prefix of
+        # too many names to examine them all at search time
+        self.popular = {}
+        groups = [(0, len(self.keys))]
+        length = 0
+        while groups:
+            length += 1
+            larger = []
+            for start, end in groups:
+                position = start
+                while position < end:
+                    if len(self.keys[position]) < length:
+                        # the name is the whole prefix of its group, it sorts first
+                        position += 1
+                        continue
+                    prefix = self.keys[position][:length]
+                    group_end = position
+                    while group_end < end and self.keys[group_end].startswith(prefix):
+                        group_end += 1
+                    if group_end - position > MAX_CANDIDATES:
+                        self.popular[prefix] = self._most_movies(position, group_end)
+                        larger.append((position, group_end))
+                    position = group_end
+            groups = larger
+
+    def search(self, query, limit=10):
+        """
+        Returns up to `limit` candidates for `query`, best first, each a
+        dictionary with the person's id, name, birth and movie count.
+        Prefixes of very many names return at most POPULAR_RESULTS.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        # kind of match and similarity of every examined name
+        matches = {}
+        start = bisect.bisect_left(self.keys, query)
+        if query in self.popular:
+            # too many names start with the query, only those of the
+            # people with most movies can make it
+            matches = {position: (PREFIX, 1.0) for position in self.popular[query]}
+            if start < len(self.keys) and self.keys[start] == query:
+                matches[start] = (EXACT, 1.0)
+        else:
+            for position in range(start, len(self.keys)):
+                if not self.keys[position].startswith(query):
+                    break
+                kind = EXACT if self.keys[position] == query else PREFIX
+                matches[position] = (kind, 1.0)
+
+        if len(matches) < limit:
+            for position, similarity in self._fuzzy(query).items():
+                if position not in matches:
+                    matches[position] = (FUZZY, similarity)
+
+        # people sharing a name are already ranked, so only the first
+        # `limit` of each can make it, and only `limit` are kept overall
+        candidates = heapq.nsmallest(limit, (
+            (kind, -similarity, -self.movie_counts[person], person)
+            for position, (kind, similarity) in matches.items()
+            for person in self.people[position][:limit]))
+
+        return [{
+            "id": self.person_ids[person],
+            "name": self.names[person],
+            "birth": self.births[person],
+            "movies": self.movie_counts[person]
+        } for _, _, _, person in candidates]
+
+    def _most_movies(self, start, end):
+        """
+        Returns the positions in self.keys, between `start` and `end`,
+        of the names of the POPULAR_RESULTS people with most movies.
+        """
+        best = heapq.nsmallest(POPULAR_RESULTS, (
+            (-self.movie_counts[person], person, position)
+            for position in range(start, end)
+            for person in self.people[position][:POPULAR_RESULTS]))
+        return array("l", sorted({position for _, _, position in best}))
+
+    def _fuzzy(self, query):
+        """
+        Returns the positions of names sharing trigrams with `query`,
+        mapped to their Dice similarity with it.
+        """
+        query_trigrams = trigrams(query)
+        known = [trigram for trigram in query_trigrams if trigram in self.postings]
+        if not known:
+            return {}
+
+        # gather candidates from the rarest trigrams only: a typo changes
+        # at most three trigrams, and rare ones keep the lists short
+        known.sort(key=lambda trigram: len(self.postings[trigram]))
+        hits = Counter()
+        for trigram in known[:RARE_TRIGRAMS]:
+            hits.update(self.postings[trigram][:MAX_CANDIDATES])
+
+        similarities = {}
+        for position, _ in hits.most_common(SCORED_CANDIDATES):
+            key_trigrams = trigrams(self.keys[position])
+            shared = len(query_trigrams & key_trigrams)
+            similarities[position] = 2 * shared / (len(query_trigrams) + len(key_trigrams))
+        return similarities
+
+
+def normalize(name):
+    """
+    Returns the form of a name used for lookups.
+    """
+    return " ".join(name.lower().split())
+
+
+def trigrams(key):
+    """
+    Returns the set of trigrams of a normalized name, padded so the
+    start and end of the name count too.
+    """
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
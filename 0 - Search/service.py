@@ -0,0 +1,212 @@
+"""
+Long-lived degrees of separation service.
+
+Loads the dataset once and answers many queries, each a pair of names
+separated by a tab, with one JSON object per query.
+
+Usage:
+    python service.py [directory] --file PAIRS     answer every line of a file
+    python service.py [directory] --stdin          answer lines read from stdin
+    python service.py [directory] --http PORT      serve GET /path?source=&target=
+                                                   and GET /stats
+    python service.py [directory] --unix PATH      serve lines on a Unix socket
+
+With --file or --stdin, --workers N fans the queries out over N processes.
+"""
+
+import argparse
+import json
+import multiprocessing
+import socketserver
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+
+
+def resolve_person(name):
+    """
+    Returns the person_id for a name or IMDb id, and None.
+    If it can't be resolved without asking, returns None and an error.
+    """
+    person_ids = sorted(degrees.names.get(name.lower(), set()))
+    if not person_ids and name in degrees.people:
+        return name, None
+    if not person_ids:
+        return None, {"error": "person not found", "name": name,
+                      "suggestions": degrees.person_candidates(name, limit=5)}
+    if len(person_ids) > 1:
+        candidates = []
+        for person_id in person_ids:
+            person = degrees.people[person_id]
+            candidates.append({"id": person_id, "name": person["name"], "birth": person["birth"]})
+        return None, {"error": "ambiguous name", "name": name, "candidates": candidates}
+    return person_ids[0], None
+
+
+def answer_query(source_name, target_name):
+    """
+    Returns a JSON-serializable dictionary answering how
+    two people are connected.
+    """
+    source, error = resolve_person(source_name)
+    if error is not None:
+        return {"source": source_name, "target": target_name, **error}
+    target, error = resolve_person(target_name)
+    if error is not None:
+        return {"source": source_name, "target": target_name, **error}
+
+    path = degrees.cached_shortest_path(source, target)
+    answer = {"source": source, "target": target}
+    if path is None:
+        answer["degrees"] = None
+        answer["path"] = None
+        return answer
+
+    answer["degrees"] = len(path)
+    answer["path"] = []
+    for movie_id, person_id in path:
+        answer["path"].append({
+            "movie_id": movie_id,
+            "movie": degrees.movies[movie_id]["title"],
+            "person_id": person_id,
+            "person": degrees.people[person_id]["name"]
+        })
+    return answer
+
+
+def answer_line(line):
+    """
+    Answers a "source<TAB>target" line, returning a JSON string.
+    """
+    fields = line.rstrip("\r\n").split("\t")
+    if len(fields) != 2:
+        return json.dumps({"error": "expected two tab-separated names", "line": line.rstrip("\r\n")})
+    return json.dumps(answer_query(*fields))
+
+
+def answer_lines(lines, output, workers=1, directory=None):
+    """
+    Answers every non-blank line, writing one JSON string per line to `output`
+    in the same order. Returns the number of lines answered.
+
+    With more than one worker, the lines are answered by a process pool.
+    Workers share the loaded graph read-only: forked workers inherit it,
+    and otherwise they memory-map the snapshot of `directory`.
+    """
+    lines = (line for line in lines if line.strip())
+    count = 0
+    if workers <= 1:
+        for answer in map(answer_line, lines):
+            print(answer, file=output)
+            count += 1
+        output.flush()
+        return count
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(workers, initializer=_init_worker, initargs=(directory,)) as pool:
+        for answer in pool.imap(answer_line, lines, chunksize=64):
+            print(answer, file=output)
+            count += 1
+    output.flush()
+    return count
+
+
+def _init_worker(directory):
+    """
+    Makes sure a pool worker has the graph loaded.
+    """
+    if degrees.graph is None:
+        degrees.load_data(directory, snapshot=True)
+
+
+class HTTPHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /path?source=NAME&target=NAME with a JSON object,
+    and GET /stats with the path cache counters.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/stats":
+            answer = degrees.path_cache.stats()
+        elif url.path == "/path" and "source" in query and "target" in query:
+            answer = answer_query(query["source"][0], query["target"][0])
+        else:
+            self.send_error(404, "Use /path?source=NAME&target=NAME or /stats")
+            return
+        body = json.dumps(answer).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # one log line per query would dominate the cost of answering it
+        pass
+
+
+class UnixHandler(socketserver.StreamRequestHandler):
+    """
+    Answers every "source<TAB>target" line sent over the connection.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.decode("utf-8")
+            if line.strip():
+                self.wfile.write(answer_line(line).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer degrees of separation queries.")
+    parser.add_argument("directory", nargs="?", default="large")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--file", help="file of tab-separated name pairs")
+    mode.add_argument("--stdin", action="store_true", help="read name pairs from stdin")
+    mode.add_argument("--http", type=int, metavar="PORT", help="serve HTTP on localhost")
+    mode.add_argument("--unix", metavar="PATH", help="serve on a Unix socket")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes answering --file or --stdin queries")
+    parser.add_argument("--cache-size", type=int, default=degrees.path_cache.maxsize,
+                        help="shortest paths kept in the LRU cache")
+    args = parser.parse_args()
+
+    degrees.path_cache.maxsize = args.cache_size
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, snapshot=True)
+    print("Data loaded.", file=sys.stderr)
+
+    if args.file or args.stdin:
+        start = time.perf_counter()
+        if args.file:
+            with open(args.file, encoding="utf-8") as f:
+                count = answer_lines(f, sys.stdout, args.workers, args.directory)
+        else:
+            count = answer_lines(sys.stdin, sys.stdout, args.workers, args.directory)
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0
+        print(f"Answered {count} queries in {elapsed:.2f} s "
+              f"({rate:.0f} queries/sec, {args.workers} workers).", file=sys.stderr)
+        if args.workers <= 1:
+            print(f"Path cache: {degrees.path_cache.stats()}", file=sys.stderr)
+    elif args.http is not None:
+        server = ThreadingHTTPServer(("127.0.0.1", args.http), HTTPHandler)
+        print(f"Serving on http://127.0.0.1:{args.http}/path", file=sys.stderr)
+        server.serve_forever()
+    else:
+        server = socketserver.ThreadingUnixStreamServer(args.unix, UnixHandler)
+        print(f"Serving on {args.unix}", file=sys.stderr)
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
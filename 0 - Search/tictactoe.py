@@ -4,11 +4,49 @@ Tic Tac Toe Player
 
 from copy import deepcopy
 import math
+import os
+
+import bitboard
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Search modes accepted by minimax
+MINIMAX = "minimax"
+ALPHABETA = "alphabeta"
+TRANSPOSITION = "transposition"
+BITBOARD = "bitboard"
+BOOK = "book"
+
+# Moves tried first by alpha-beta: center, corners, then edges
+MOVE_ORDER = [(1, 1), (0, 0), (0, 2), (2, 0), (2, 2), (0, 1), (1, 0), (1, 2), (2, 1)]
+
+# Positions evaluated by the search, see reset_node_count
+node_count = 0
+
+# Cell values used by canonical_key
+CELL_CODES = {EMPTY: 0, X: 1, O: 2}
+
+# The 8 rotations and reflections of the board, as the (row, column)
+# read into each position of a flattened board
+SYMMETRIES = []
+for transform in [lambda i, j: (i, j), lambda i, j: (j, 2 - i),
+                  lambda i, j: (2 - i, 2 - j), lambda i, j: (2 - j, i)]:
+    SYMMETRIES.append([transform(i, j) for i in range(3) for j in range(3)])
+    SYMMETRIES.append([transform(i, 2 - j) for i in range(3) for j in range(3)])
+
+# Exact utility values of the positions solved so far, by canonical_key
+transposition_table = {}
+
+# Solved game: one byte per board, indexed by book_index, holding the
+# best move in the low 4 bits (NO_MOVE once the game is over) and the
+# utility value plus one in the high 4 bits
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe.book")
+BOOK_SIZE = 3 ** 9
+NO_MOVE = 15
+opening_book = None
+
 
 def initial_state():
     """
@@ -122,13 +160,32 @@ def utility(board):
         return 0
 
 
-def minimax(board):
+def minimax(board, mode=MINIMAX):
     """
     Returns the optimal action for the current player on the board.
+
+    `mode` picks the search: MINIMAX explores the whole game tree,
+    ALPHABETA prunes it and TRANSPOSITION remembers the value of every
+    position across calls. BITBOARD solves the board as two bitmasks,
+    see bitboard.py. BOOK reads the action from the solved game built
+    by build_book. All of them return the same action.
     """
+    if mode == BOOK:
+        return book_move(board)
+
     if terminal(board):
         return None
-    
+
+    if mode == BITBOARD:
+        x, o = to_bitboard(board)
+        square = bitboard.best_move(x, o, [3 * row + column for row, column in actions(board)])
+        return divmod(square, 3)
+
+    if mode == ALPHABETA:
+        return alphabeta(board)
+    if mode == TRANSPOSITION:
+        return transposition(board)
+
     # if current player is X, check the next moves
     # starting with O, and stores the best option
     if player(board) == X:
@@ -156,6 +213,8 @@ def max_value(board):
     """
     Finds the utility value to X move
     """
+    global node_count
+    node_count += 1
     if terminal(board): 
         return utility(board)
     
@@ -169,6 +228,8 @@ def min_value(board):
     """
     Finds the utility value to O move
     """
+    global node_count
+    node_count += 1
     if terminal(board): 
         return utility(board)
 
@@ -176,3 +237,249 @@ def min_value(board):
     for action in actions(board):
         utility_value = min(utility_value, max_value(result(board, action)))   
     return utility_value
+
+
+def alphabeta(board):
+    """
+    Returns the same action as minimax, pruning with alpha-beta.
+    """
+    # the root keeps the order of actions(), and only strictly better
+    # values replace the best move, so ties resolve like in minimax
+    alpha = -math.inf
+    beta = math.inf
+    next_move = None
+    if player(board) == X:
+        for action in actions(board):
+            utility_value = alphabeta_value(result(board, action), alpha, beta)
+            if utility_value > alpha:
+                alpha = utility_value
+                next_move = action
+    else:
+        for action in actions(board):
+            utility_value = alphabeta_value(result(board, action), alpha, beta)
+            if utility_value < beta:
+                beta = utility_value
+                next_move = action
+    return next_move
+
+
+def alphabeta_value(board, alpha, beta):
+    """
+    Finds the utility value of the board for the player to move,
+    exact if it lies between alpha and beta, otherwise a bound past them
+    """
+    global node_count
+    node_count += 1
+    if terminal(board):
+        return utility(board)
+
+    if player(board) == X:
+        utility_value = -math.inf
+        for action in ordered_actions(board):
+            utility_value = max(utility_value, alphabeta_value(result(board, action), alpha, beta))
+            # O already has a better option elsewhere
+            if utility_value >= beta:
+                break
+            alpha = max(alpha, utility_value)
+    else:
+        utility_value = math.inf
+        for action in ordered_actions(board):
+            utility_value = min(utility_value, alphabeta_value(result(board, action), alpha, beta))
+            # X already has a better option elsewhere
+            if utility_value <= alpha:
+                break
+            beta = min(beta, utility_value)
+    return utility_value
+
+
+def ordered_actions(board):
+    """
+    Returns the possible actions on the board, most promising first.
+    """
+    return [(row, column) for (row, column) in MOVE_ORDER if board[row][column] == EMPTY]
+
+
+def transposition(board):
+    """
+    Returns the same action as minimax, solving positions through
+    the transposition table.
+    """
+    # same root loop as minimax, so ties resolve the same way
+    if player(board) == X:
+        best_value = -math.inf
+        next_move = None
+        for action in actions(board):
+            utility_value = solved_value(result(board, action))
+            if utility_value > best_value:
+                best_value = utility_value
+                next_move = action
+    else:
+        best_value = math.inf
+        next_move = None
+        for action in actions(board):
+            utility_value = solved_value(result(board, action))
+            if utility_value < best_value:
+                best_value = utility_value
+                next_move = action
+    return next_move
+
+
+def solved_value(board):
+    """
+    Finds the exact utility value of the board, looking it up in
+    the transposition table, and storing it there when missing
+    """
+    key = canonical_key(board)
+    if key in transposition_table:
+        return transposition_table[key]
+
+    global node_count
+    node_count += 1
+    if terminal(board):
+        utility_value = utility(board)
+    elif player(board) == X:
+        utility_value = max(solved_value(result(board, action)) for action in actions(board))
+    else:
+        utility_value = min(solved_value(result(board, action)) for action in actions(board))
+
+    transposition_table[key] = utility_value
+    return utility_value
+
+
+def canonical_key(board):
+    """
+    Returns a key shared by the board and all its rotations and
+    reflections, which have the same utility value.
+    """
+    return min(tuple(CELL_CODES[board[i][j]] for i, j in symmetry) for symmetry in SYMMETRIES)
+
+
+def to_bitboard(board):
+    """
+    Returns the masks of the squares taken by X and by O on the board.
+    """
+    x = 0
+    o = 0
+    for row in range(3):
+        for column in range(3):
+            if board[row][column] == X:
+                x |= 1 << (3 * row + column)
+            elif board[row][column] == O:
+                o |= 1 << (3 * row + column)
+    return x, o
+
+
+def from_bitboard(x, o):
+    """
+    Returns the board with the squares in the X and O masks taken.
+    """
+    board = initial_state()
+    for row in range(3):
+        for column in range(3):
+            if x >> (3 * row + column) & 1:
+                board[row][column] = X
+            elif o >> (3 * row + column) & 1:
+                board[row][column] = O
+    return board
+
+
+def book_index(board):
+    """
+    Returns the position of the board in the opening book,
+    reading its squares as a base 3 number.
+    """
+    index = 0
+    for row in board:
+        for cell in row:
+            index = 3 * index + CELL_CODES[cell]
+    return index
+
+
+def book_move(board):
+    """
+    Returns the optimal action for the current player on the board,
+    read from the opening book, which is loaded or built on first use.
+    """
+    global opening_book
+    if opening_book is None:
+        opening_book = load_book()
+    move = opening_book[book_index(board)] & 0x0F
+    if move == NO_MOVE:
+        return None
+    return divmod(move, 3)
+
+
+def book_value(board):
+    """
+    Returns the utility value of the board under perfect play,
+    read from the opening book.
+    """
+    global opening_book
+    if opening_book is None:
+        opening_book = load_book()
+    return (opening_book[book_index(board)] >> 4) - 1
+
+
+def build_book(path=BOOK_PATH):
+    """
+    Solves every position reachable from the initial state and writes
+    the opening book to `path`, unless it is None. Returns the book.
+    """
+    book = bytearray([NO_MOVE] * BOOK_SIZE)
+    positions = [initial_state()]
+    solved = set()
+    while positions:
+        board = positions.pop()
+        index = book_index(board)
+        if index in solved:
+            continue
+        solved.add(index)
+
+        x, o = to_bitboard(board)
+        move = NO_MOVE
+        if not terminal(board):
+            (row, column) = minimax(board, BITBOARD)
+            move = 3 * row + column
+            for action in actions(board):
+                positions.append(result(board, action))
+        book[index] = (bitboard.value(x, o) + 1) << 4 | move
+
+    if path is not None:
+        with open(path, "wb") as f:
+            f.write(book)
+    return bytes(book)
+
+
+def load_book(path=BOOK_PATH):
+    """
+    Returns the opening book stored at `path`, building it first
+    if it is missing or damaged.
+    """
+    try:
+        with open(path, "rb") as f:
+            book = f.read()
+        if len(book) == BOOK_SIZE:
+            return book
+    except FileNotFoundError:
+        pass
+    try:
+        return build_book(path)
+    except OSError:
+        # can't write next to this file, keep the book in memory
+        return build_book(None)
+
+
+def reset_node_count():
+    """
+    Returns the number of positions evaluated since the last reset,
+    and starts counting again from zero.
+    """
+    global node_count
+    count = node_count
+    node_count = 0
+    return count
+
+
+if __name__ == "__main__":
+    build_book()
+    print(f"Opening book written to {BOOK_PATH}")
@@ -0,0 +1,177 @@
+"""
+Headless benchmark of MinesweeperAI over many seeded games.
+
+Usage: python benchmark_minesweeper.py [--games N] [--seed SEED] [--workers N]
+                                       [--strategy random|guess] [BOARD ...]
+
+Boards are given as WIDTHxHEIGHT:MINES, by default 8x8:10, 16x16:40 and
+30x16:99. Game i of every board is seeded with SEED + i, so a run can be
+repeated exactly whatever the number of workers.
+
+For every board, reports the win rate and the latency of the AI's
+inference (add_knowledge) and of picking its next move, the peak number
+of sentences in its knowledge and its peak memory. Peak memory is
+measured on a separate run of a few games, since tracing allocations
+slows the AI down.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+import tracemalloc
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+BOARDS = ["8x8:10", "16x16:40", "30x16:99"]
+
+STRATEGIES = ["random", "guess"]
+
+# Games played again with allocation tracing, for every board
+MEMORY_GAMES = 5
+
+
+def parse_board(text):
+    """
+    Returns the height, width and number of mines of a board
+    given as WIDTHxHEIGHT:MINES.
+    """
+    try:
+        size, mines = text.split(":")
+        width, height = size.lower().split("x")
+        board = (int(height), int(width), int(mines))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid board {text!r}, expected WIDTHxHEIGHT:MINES")
+    if board[2] >= board[0] * board[1]:
+        raise argparse.ArgumentTypeError(f"too many mines on board {text!r}")
+    return board
+
+
+def play_game(game):
+    """
+    Plays one seeded game, given as (height, width, mines, strategy, seed),
+    until the AI wins or clicks a mine.
+
+    Returns whether the AI won, the time taken by each call to add_knowledge
+    and by each move choice, and the peak number of sentences known.
+    """
+    height, width, mines, strategy, seed = game
+    random.seed(seed)
+    board = Minesweeper(height, width, mines)
+    ai = MinesweeperAI(height, width, mines)
+    guess = ai.make_best_guess_move if strategy == "guess" else ai.make_random_move
+
+    inference = []
+    choices = []
+    peak = 0
+    revealed = 0
+    while True:
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = guess()
+        choices.append(time.perf_counter() - start)
+        if move is None or board.is_mine(move):
+            return False, inference, choices, peak
+
+        start = time.perf_counter()
+        ai.add_knowledge(move, board.nearby_mines(move))
+        inference.append(time.perf_counter() - start)
+        peak = max(peak, len(ai.sentences))
+
+        revealed += 1
+        if revealed == height * width - mines:
+            return True, inference, choices, peak
+
+
+def play_games(games, workers):
+    """
+    Yields the result of every game, in order, using `workers` processes.
+    """
+    if workers <= 1:
+        yield from map(play_game, games)
+        return
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(workers) as pool:
+        yield from pool.imap(play_game, games, chunksize=16)
+
+
+def percentile(timings, fraction):
+    """
+    Returns the value below which `fraction` of the sorted timings fall.
+    """
+    if not timings:
+        return 0
+    return timings[min(int(fraction * len(timings)), len(timings) - 1)]
+
+
+def benchmark(board, strategy, games, seed, workers):
+    """
+    Plays the games on one board and returns a dictionary of results.
+    """
+    height, width, mines = board
+    seeded = [(height, width, mines, strategy, seed + game) for game in range(games)]
+
+    start = time.perf_counter()
+    wins = 0
+    inference = []
+    choices = []
+    peak_sentences = 0
+    for won, game_inference, game_choices, peak in play_games(seeded, workers):
+        wins += won
+        inference.extend(game_inference)
+        choices.extend(game_choices)
+        peak_sentences = max(peak_sentences, peak)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for game in seeded[:MEMORY_GAMES]:
+        play_game(game)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    inference.sort()
+    choices.sort()
+    return {
+        "board": f"{width}x{height}:{mines}",
+        "games": games,
+        "wins": wins / games,
+        "p50": percentile(inference, 0.5),
+        "p90": percentile(inference, 0.9),
+        "p99": percentile(inference, 0.99),
+        "worst": inference[-1] if inference else 0,
+        "choice": percentile(choices, 0.99),
+        "sentences": peak_sentences,
+        "memory": peak_memory,
+        "elapsed": elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MinesweeperAI on seeded games.")
+    parser.add_argument("boards", nargs="*", type=parse_board, default=[parse_board(board) for board in BOARDS],
+                        metavar="BOARD", help="boards to play, as WIDTHxHEIGHT:MINES")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--strategy", choices=STRATEGIES, default="guess",
+                        help="move to make when no cell is known to be safe")
+    args = parser.parse_args()
+
+    print(f"{'board':<12}{'games':>7}{'won %':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}"
+          f"{'max ms':>9}{'move p99':>10}{'sentences':>11}{'peak KiB':>10}{'wall s':>8}")
+    for board in args.boards:
+        r = benchmark(board, args.strategy, args.games, args.seed, args.workers)
+        print(f"{r['board']:<12}{r['games']:>7}{r['wins'] * 100:>8.1f}"
+              f"{r['p50'] * 1000:>9.3f}{r['p90'] * 1000:>9.3f}{r['p99'] * 1000:>9.3f}"
+              f"{r['worst'] * 1000:>9.3f}{r['choice'] * 1000:>10.3f}"
+              f"{r['sentences']:>11}{r['memory'] / 1024:>10.0f}{r['elapsed']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+"""
+Entailment by SAT solving, as an alternative to logic.model_check.
+
+A knowledge base entails a query when the knowledge base together with
+the negation of the query can't be satisfied. Sentences are converted
+to clauses (conjunctive normal form) with the Tseitin transformation,
+which gives every compound sentence a variable of its own instead of
+distributing Or over And, so the clauses grow linearly with the
+sentence. The clauses are then solved by DPLL: unit propagation over
+two watched literals per clause, and backtracking on the latest decision
+not yet flipped.
+
+model_check_all and entails_all answer many queries about the same
+knowledge base at once, from a single enumeration of its models or a
+single solver. compiled_model_check_all enumerates models like
+model_check_all, but evaluates sentences on many models at once with
+integer bit operations.
+"""
+
+import itertools
+
+from logic import And, Or, Not, Implication, Biconditional, Symbol
+
+# Models evaluated together by compiled_model_check_all,
+# as the bits of one integer, are 2 ** CHUNK_SYMBOLS
+CHUNK_SYMBOLS = 16
+
+# Operations of compiled sentences
+NOT, AND, OR, IMPLIES, IFF = range(5)
+
+
+class CNF():
+    """
+    Clauses in conjunctive normal form. Variables are numbered from 1,
+    and a literal is a variable number, negated for the variable's negation.
+    """
+
+    def __init__(self):
+        # Variable of every symbol, by symbol name
+        self.variables = {}
+        self.variable_count = 0
+
+        # Each clause is a list of literals, one of which must be true
+        self.clauses = []
+
+        # Literal standing for every compound sentence already converted
+        self.literals = {}
+
+    def new_variable(self):
+        self.variable_count += 1
+        return self.variable_count
+
+    def variable(self, name):
+        """
+        Returns the variable of the symbol called `name`.
+        """
+        if name not in self.variables:
+            self.variables[name] = self.new_variable()
+        return self.variables[name]
+
+    def add_clause(self, literals):
+        """
+        Adds a clause, leaving out repeated literals,
+        unless it always holds.
+        """
+        clause = list(dict.fromkeys(literals))
+        if any(-literal in clause for literal in clause):
+            return
+        self.clauses.append(clause)
+
+    def add(self, sentence):
+        """
+        Adds clauses that hold only if `sentence` is true.
+        """
+        # top-level conjunctions and disjunctions need no variable of their own
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.add_clause([self.literal(disjunct) for disjunct in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            self.add_clause([-self.literal(sentence.antecedent), self.literal(sentence.consequent)])
+        else:
+            self.add_clause([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """
+        Returns a literal that is true exactly when `sentence` is,
+        adding the clauses that define it.
+        """
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        if isinstance(sentence, And):
+            parts = [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            literal = self.new_variable()
+            # literal -> every part, and all parts -> literal
+            for part in parts:
+                self.add_clause([-literal, part])
+            self.add_clause([literal] + [-part for part in parts])
+        elif isinstance(sentence, (Or, Implication)):
+            if isinstance(sentence, Or):
+                parts = [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            else:
+                parts = [-self.literal(sentence.antecedent), self.literal(sentence.consequent)]
+            literal = self.new_variable()
+            # literal -> some part, and any part -> literal
+            self.add_clause([-literal] + parts)
+            for part in parts:
+                self.add_clause([literal, -part])
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            literal = self.new_variable()
+            self.add_clause([-literal, -left, right])
+            self.add_clause([-literal, left, -right])
+            self.add_clause([literal, left, right])
+            self.add_clause([literal, -left, -right])
+        else:
+            raise TypeError("must be a logical sentence")
+
+        self.literals[sentence] = literal
+        return literal
+
+
+class Solver():
+    """
+    DPLL solver for the clauses of a CNF.
+    """
+
+    def __init__(self, cnf):
+        self.variable_count = cnf.variable_count
+        self.unsatisfiable = False
+
+        # single literal clauses are assigned up front, the others are
+        # watched by their first two literals: a clause can only become
+        # unit or false once one of those is false
+        self.units = []
+        self.watches = {}
+        occurrences = [0] * (self.variable_count + 1)
+        for clause in cnf.clauses:
+            for literal in clause:
+                occurrences[abs(literal)] += 1
+            if not clause:
+                self.unsatisfiable = True
+            elif len(clause) == 1:
+                self.units.append(clause[0])
+            else:
+                clause = list(clause)
+                self.watches.setdefault(clause[0], []).append(clause)
+                self.watches.setdefault(clause[1], []).append(clause)
+
+        # decide the variables in the most clauses first
+        self.order = sorted(range(1, self.variable_count + 1),
+                            key=lambda variable: -occurrences[variable])
+
+        self.values = []
+        self.trail = []
+        self.head = 0
+
+    def solve(self, assumptions=()):
+        """
+        Returns a list giving the value of every variable (indexed by
+        variable number) in a model of the clauses where all literals in
+        `assumptions` are true, or None if there is no such model.
+        """
+        if self.unsatisfiable:
+            return None
+        self.values = [None] * (self.variable_count + 1)
+        self.trail = []
+        self.head = 0
+        for literal in self.units + list(assumptions):
+            if not self.assign(literal):
+                return None
+        if not self.propagate():
+            return None
+
+        # decisions made, as (trail length before it, literal, flipped)
+        decisions = []
+        while True:
+            variable = next((variable for variable in self.order
+                             if self.values[variable] is None), None)
+            if variable is None:
+                return self.values
+            decisions.append((len(self.trail), variable, False))
+            self.assign(variable)
+
+            while not self.propagate():
+                # undo up to the latest decision not tried both ways, and flip it
+                while decisions and decisions[-1][2]:
+                    decisions.pop()
+                if not decisions:
+                    return None
+                start, literal, _ = decisions.pop()
+                self.undo(start)
+                decisions.append((start, -literal, True))
+                self.assign(-literal)
+
+    def value(self, literal):
+        """
+        Returns True or False if the literal is assigned, None otherwise.
+        """
+        value = self.values[abs(literal)]
+        if value is None:
+            return None
+        return value == (literal > 0)
+
+    def assign(self, literal):
+        """
+        Makes `literal` true, returning False if it already is false.
+        """
+        value = self.value(literal)
+        if value is not None:
+            return value
+        self.values[abs(literal)] = literal > 0
+        self.trail.append(literal)
+        return True
+
+    def undo(self, length):
+        """
+        Unassigns the literals assigned after the first `length` ones.
+        """
+        while len(self.trail) > length:
+            self.values[abs(self.trail.pop())] = None
+        self.head = length
+
+    def propagate(self):
+        """
+        Assigns the last literal of every clause whose other literals are
+        all false, until there is none left. Returns False if a clause
+        has all of its literals false.
+        """
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            watching = self.watches.get(false_literal)
+            if not watching:
+                continue
+
+            kept = []
+            for position, clause in enumerate(watching):
+                # keep the false literal second, the other watched one first
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                other = self.value(clause[0])
+                if other is True:
+                    kept.append(clause)
+                    continue
+
+                # watch another literal that isn't false, if there is one
+                for index in range(2, len(clause)):
+                    if self.value(clause[index]) is not False:
+                        clause[1], clause[index] = clause[index], clause[1]
+                        self.watches.setdefault(clause[1], []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if other is False:
+                        kept.extend(watching[position + 1:])
+                        self.watches[false_literal] = kept
+                        return False
+                    self.assign(clause[0])
+            self.watches[false_literal] = kept
+        return True
+
+
+def entails(knowledge, query):
+    """
+    Returns True if `knowledge` entails `query`, like logic.model_check.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    query_literal = cnf.literal(query)
+    return Solver(cnf).solve([-query_literal]) is None
+
+
+def entails_all(knowledge, queries):
+    """
+    Returns, for every query, whether `knowledge` entails it.
+
+    Every model the solver finds is a counterexample for each query false
+    in it, so queries are only solved for one by one while no model
+    found so far rules them out.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    literals = [cnf.literal(query) for query in queries]
+    solver = Solver(cnf)
+
+    model = solver.solve()
+    if model is None:
+        # nothing is consistent with the knowledge, so it entails everything
+        return [True] * len(queries)
+
+    entailed = [None] * len(queries)
+    for index, literal in enumerate(literals):
+        if entailed[index] is not None:
+            continue
+        if not holds(model, literal):
+            entailed[index] = False
+            continue
+        counterexample = solver.solve([-literal])
+        if counterexample is None:
+            entailed[index] = True
+            continue
+        # the counterexample rules out this query and maybe later ones
+        model = counterexample
+        for other in range(index, len(queries)):
+            if not holds(model, literals[other]):
+                entailed[other] = False
+    return entailed
+
+
+def holds(model, literal):
+    """
+    Returns True if `literal` is true in `model`, as returned by Solver.solve.
+    """
+    return model[abs(literal)] == (literal > 0)
+
+
+def model_check_all(knowledge, queries):
+    """
+    Returns, for every query, whether `knowledge` entails it, enumerating
+    every model once instead of once per query like logic.model_check.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), *(query.symbols() for query in queries)))
+
+    # queries not yet found false in a model of the knowledge
+    undecided = list(range(len(queries)))
+    entailed = [True] * len(queries)
+    for values in itertools.product([True, False], repeat=len(symbols)):
+        model = dict(zip(symbols, values))
+        if not knowledge.evaluate(model):
+            continue
+        for index in undecided:
+            if not queries[index].evaluate(model):
+                entailed[index] = False
+        undecided = [index for index in undecided if entailed[index]]
+        if not undecided:
+            break
+    return entailed
+
+
+def compile_sentences(sentences, symbols):
+    """
+    Compiles sentences into a program of bit operations on truth vectors:
+    integers whose bit m is the value of a sentence in model m.
+
+    Registers 0 to len(symbols) - 1 hold the vectors of `symbols`, and
+    every instruction (operation, operand registers) of the program
+    computes one more register. Returns the program and the register
+    holding each sentence.
+    """
+    index = {name: register for register, name in enumerate(symbols)}
+    program = []
+    registers = {}
+
+    def register(sentence):
+        if isinstance(sentence, Symbol):
+            return index[sentence.name]
+        if sentence in registers:
+            return registers[sentence]
+        if isinstance(sentence, Not):
+            instruction = (NOT, (register(sentence.operand),))
+        elif isinstance(sentence, And):
+            instruction = (AND, tuple(register(conjunct) for conjunct in sentence.conjuncts))
+        elif isinstance(sentence, Or):
+            instruction = (OR, tuple(register(disjunct) for disjunct in sentence.disjuncts))
+        elif isinstance(sentence, Implication):
+            instruction = (IMPLIES, (register(sentence.antecedent), register(sentence.consequent)))
+        elif isinstance(sentence, Biconditional):
+            instruction = (IFF, (register(sentence.left), register(sentence.right)))
+        else:
+            raise TypeError("must be a logical sentence")
+        program.append(instruction)
+        registers[sentence] = len(symbols) + len(program) - 1
+        return registers[sentence]
+
+    return program, [register(sentence) for sentence in sentences]
+
+
+def run(program, vectors, mask):
+    """
+    Runs a compiled program on the truth vectors of its symbols, where
+    `mask` has a bit set for every model, and returns all registers.
+    """
+    registers = list(vectors)
+    for operation, operands in program:
+        if operation == NOT:
+            value = mask ^ registers[operands[0]]
+        elif operation == AND:
+            value = mask
+            for operand in operands:
+                value &= registers[operand]
+        elif operation == OR:
+            value = 0
+            for operand in operands:
+                value |= registers[operand]
+        elif operation == IMPLIES:
+            value = (mask ^ registers[operands[0]]) | registers[operands[1]]
+        else:
+            value = mask ^ registers[operands[0]] ^ registers[operands[1]]
+        registers.append(value)
+    return registers
+
+
+def compiled_model_check_all(knowledge, queries):
+    """
+    Returns, for every query, whether `knowledge` entails it.
+
+    Models are numbered so that symbol i is true in model m if bit i of m
+    is set, and evaluated 2 ** CHUNK_SYMBOLS at a time: the first symbols
+    alternate within a chunk, the others are the same all over it. A query
+    is entailed if no model of the knowledge makes it false, that is if
+    knowledge & ~query is 0 in every chunk.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), *(query.symbols() for query in queries)))
+    program, outputs = compile_sentences([knowledge, *queries], symbols)
+
+    low = min(len(symbols), CHUNK_SYMBOLS)
+    mask = (1 << (1 << low)) - 1
+    # symbol i is false for 2 ** i models, then true for 2 ** i models, and so on
+    patterns = [mask // ((1 << (2 << i)) - 1) * (((1 << (1 << i)) - 1) << (1 << i))
+                for i in range(low)]
+
+    entailed = [True] * len(queries)
+    for chunk in range(1 << (len(symbols) - low)):
+        vectors = patterns + [mask if chunk >> i & 1 else 0 for i in range(len(symbols) - low)]
+        registers = run(program, vectors, mask)
+        models = registers[outputs[0]]
+        if not models:
+            continue
+        for index, output in enumerate(outputs[1:]):
+            if entailed[index] and models & ~registers[output]:
+                entailed[index] = False
+        if not any(entailed):
+            break
+    return entailed
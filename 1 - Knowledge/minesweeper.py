@@ -1,7 +1,16 @@
+from collections import deque
 from copy import copy
 import itertools
+import math
 import random
 
+# Largest group of linked frontier cells whose mine layouts are enumerated
+MAX_COMPONENT_CELLS = 40
+
+# Chance of a mine assumed for cells no sentence mentions,
+# when the AI isn't told how many mines the board has
+DEFAULT_MINE_DENSITY = 0.15
+
 
 class Minesweeper():
     """
@@ -16,20 +25,22 @@ class Minesweeper():
         self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        self.board = [[False] * width for _ in range(height)]
+
+        # Add mines randomly, drawing distinct cells
+        for index in random.sample(range(height * width), mines):
+            (i, j) = divmod(index, width)
+            self.mines.add((i, j))
+            self.board[i][j] = True
+
+        # Count the mines within one row and column of every cell,
+        # the cell itself included, by adding each mine to its 3x3 window
+        self.counts = [[0] * width for _ in range(height)]
+        for (mine_row, mine_column) in self.mines:
+            for i in range(max(mine_row - 1, 0), min(mine_row + 2, height)):
+                counts_row = self.counts[i]
+                for j in range(max(mine_column - 1, 0), min(mine_column + 2, width)):
+                    counts_row[j] += 1
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -59,24 +70,8 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        i, j = cell
+        return self.counts[i][j] - self.board[i][j]
 
     def won(self):
         """
@@ -85,18 +80,62 @@ class Minesweeper():
         return self.mines_found == self.mines
 
 
+def neighbors(cell, height, width):
+    """
+    Returns the cells within one row and column of `cell`, not including
+    the cell itself, on a board of the given size.
+    """
+    (row, column) = cell
+    return tuple((i, j)
+                 for i in range(max(row - 1, 0), min(row + 2, height))
+                 for j in range(max(column - 1, 0), min(column + 2, width))
+                 if (i, j) != (row, column))
+
+
 class Sentence():
     """
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    Cells are stored as bits of an integer mask, cell (i, j) being
+    bit i * width + j, so sentences over the same width can be compared
+    and subtracted with bit operations.
     """
 
-    def __init__(self, cells, count):
-        self.cells = set(cells)
+    __slots__ = ("mask", "count", "width")
+
+    def __init__(self, cells, count, width=None):
+        cells = list(cells)
+        if width is None:
+            width = 1 + max((j for _, j in cells), default=0)
+        self.width = width
+        self.mask = 0
+        for cell in cells:
+            self.mask |= 1 << cell_index(cell, width)
         self.count = count
 
+    @classmethod
+    def from_mask(cls, mask, count, width):
+        """
+        Returns the sentence whose cells are the bits set in `mask`.
+        """
+        sentence = cls.__new__(cls)
+        sentence.mask = mask
+        sentence.count = count
+        sentence.width = width
+        return sentence
+
+    @property
+    def cells(self):
+        """
+        Set of the (i, j) cells in the sentence.
+        """
+        return {divmod(index, self.width) for index in cell_indexes(self.mask)}
+
     def __eq__(self, other):
+        if self.width == other.width:
+            return self.mask == other.mask and self.count == other.count
         return self.cells == other.cells and self.count == other.count
 
     def __str__(self):
@@ -106,7 +145,7 @@ class Sentence():
         """
         Returns the set of all cells in self.cells known to be mines.
         """
-        if len(self.cells) == self.count:
+        if self.mask.bit_count() == self.count:
             return self.cells
 
     def known_safes(self):
@@ -121,8 +160,9 @@ class Sentence():
         Updates internal knowledge representation given the fact that
         a cell is known to be a mine.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        bit = self.bit(cell)
+        if self.mask & bit:
+            self.mask ^= bit
             self.count -= 1
 
     def mark_safe(self, cell):
@@ -130,8 +170,86 @@ class Sentence():
         Updates internal knowledge representation given the fact that
         a cell is known to be safe.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        bit = self.bit(cell)
+        if self.mask & bit:
+            self.mask ^= bit
+
+    def bit(self, cell):
+        """
+        Returns the bit of `cell` in the mask, or 0 if the cell
+        can't be in a sentence of this width.
+        """
+        (i, j) = cell
+        if i < 0 or not 0 <= j < self.width:
+            return 0
+        return 1 << cell_index(cell, self.width)
+
+
+def cell_index(cell, width):
+    """
+    Returns the index of cell (i, j) on a board `width` cells wide.
+    """
+    (i, j) = cell
+    return i * width + j
+
+
+def cell_indexes(mask):
+    """
+    Yields the indexes of the bits set in `mask`, lowest first.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class CellPool():
+    """
+    Set of cells with constant time insertion, removal and random choice.
+    Cells are kept in a list, with each cell's position in a dictionary;
+    removing a cell moves the last one into its place.
+    """
+
+    def __init__(self, cells=()):
+        self.cells = []
+        self.positions = {}
+        for cell in cells:
+            self.add(cell)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return cell in self.positions
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def add(self, cell):
+        if cell not in self.positions:
+            self.positions[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell):
+        position = self.positions.pop(cell, None)
+        if position is None:
+            return
+        last = self.cells.pop()
+        if position < len(self.cells):
+            self.cells[position] = last
+            self.positions[last] = position
+
+    def any(self):
+        """
+        Returns a cell of the pool, or None if it is empty.
+        """
+        return self.cells[-1] if self.cells else None
+
+    def choice(self):
+        """
+        Returns a random cell of the pool, or None if it is empty.
+        """
+        return random.choice(self.cells) if self.cells else None
 
 
 class MinesweeperAI():
@@ -139,12 +257,18 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mine_count=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines on the board, if known
+        self.mine_count = mine_count
+
+        # Mine layouts of frontier components, see component_layouts
+        self.layout_cache = {}
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -152,26 +276,89 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Cells not chosen yet that are not known to be mines,
+        # and those of them known to be safe
+        self.unknown_moves = CellPool((i, j) for i in range(height) for j in range(width))
+        self.safe_moves = CellPool()
+
+        # Sentences about the game known to be true, by their mask of
+        # cells, so the same sentence is never stored twice
+        self.sentences = {}
+
+        # Maps each cell index to the keys of the sentences that mention it
+        self.cell_sentences = {}
+
+        # Keys of sentences changed since inference last looked at them
+        self.pending = deque()
+
+        # Neighbors of every cell by cell index, filled in as cells are played
+        self.neighbor_table = [None] * (height * width)
+
+    @property
+    def knowledge(self):
+        """
+        List of sentences about the game known to be true.
+        """
+        return list(self.sentences.values())
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
+        if cell in self.mines:
+            return
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.unknown_moves.discard(cell)
+        self.update_sentences(cell, Sentence.mark_mine)
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        if cell in self.safes:
+            return
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        if cell not in self.moves_made:
+            self.safe_moves.add(cell)
+        self.update_sentences(cell, Sentence.mark_safe)
+
+    def update_sentences(self, cell, mark):
+        """
+        Applies `mark` (Sentence.mark_mine or Sentence.mark_safe) for `cell`
+        to the sentences that mention it, which are the only ones it changes.
+        """
+        index = cell_index(cell, self.width)
+        for key in self.cell_sentences.pop(index, ()):
+            sentence = self.sentences.pop(key)
+            for other_index in cell_indexes(key ^ 1 << index):
+                self.cell_sentences[other_index].discard(key)
+            mark(sentence, cell)
+            self.add_sentence(sentence)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base, unless it is empty
+        or already known, and queues it for inference.
+        """
+        key = sentence.mask
+        if not key or key in self.sentences:
+            return
+        self.sentences[key] = sentence
+        for index in cell_indexes(key):
+            self.cell_sentences.setdefault(index, set()).add(key)
+        self.pending.append(key)
+
+    def neighbors(self, cell):
+        """
+        Returns the cells within one row and column of `cell`,
+        not including the cell itself.
+        """
+        index = cell_index(cell, self.width)
+        if self.neighbor_table[index] is None:
+            self.neighbor_table[index] = neighbors(cell, self.height, self.width)
+        return self.neighbor_table[index]
 
     def add_knowledge(self, cell, count):
         """
@@ -180,6 +367,8 @@ class MinesweeperAI():
         """
         # 1) mark the cell as a move that has been made
         self.moves_made.add(cell)
+        self.unknown_moves.discard(cell)
+        self.safe_moves.discard(cell)
 
         # 2) mark the cell as safe
         self.mark_safe(cell)
@@ -187,112 +376,59 @@ class MinesweeperAI():
         # 3) add a new sentence to the AI's knowledge base
         #    based on the value of `cell` and `count`
 
-        # create a list of neighboring cells
-        (cell_row, cell_column) = cell
-        neighboring_cells = []
-        neighboring_row = cell_row - 1
-        while neighboring_row < cell_row + 2:
-            if neighboring_row > self.height - 1:
-                break
-            neighboring_column = cell_column - 1
-            while neighboring_column < cell_column + 2:
-                if neighboring_row == cell_row and neighboring_column == cell_column:
-                    neighboring_column += 1
-                    continue
-                elif neighboring_row < 0:
-                    neighboring_row += 1
-                    continue
-                elif neighboring_column < 0:
-                    neighboring_column += 1
-                    continue
-                elif neighboring_column > self.width - 1:
-                    break
-                else:
-                    neighboring_cells.append((neighboring_row, neighboring_column))
-                neighboring_column += 1
-            neighboring_row += 1
-        
-        # create sentence
-        new_sentence = Sentence(neighboring_cells, count)
-
-        # check if there are mines or safes in the sentence
-        # and update knowledge base
-        mines_in_sentence = new_sentence.known_mines()
-        safes_in_sentence = new_sentence.known_safes()
-        if mines_in_sentence:
-            for mine in mines_in_sentence:
-                self.mark_mine(mine)
-        if safes_in_sentence:
-            for safe in safes_in_sentence:
-                self.mark_safe(safe)
-
-        # exclude known cells from sentence
-        for item in self.safes:
-            if item in new_sentence.cells:
-                new_sentence.mark_safe(item)
-        for item in self.mines:
-            if item in new_sentence.cells:
-                new_sentence.mark_mine(item)
-        for item in self.moves_made:
-            if item in new_sentence.cells:
-                new_sentence.mark_safe(item)
-        
-        # if unknown cells remains, add sentence to knowledge base
-        if len(new_sentence.cells) > 0:
-            self.knowledge.append(new_sentence)
-
-        # 4) mark any additional cells as safe or as mines
-        #    if it can be concluded based on the AI's knowledge base
-        for sentence in self.knowledge:
+        # leave known cells out of the sentence
+        unknown_cells = set()
+        for neighbor in self.neighbors(cell):
+            if neighbor in self.mines:
+                count -= 1
+            elif neighbor not in self.safes:
+                unknown_cells.add(neighbor)
+        self.add_sentence(Sentence(unknown_cells, count, self.width))
+
+        # 4) and 5) mark cells as safe or as mines, and infer new
+        #    sentences, until nothing more can be concluded
+        self.infer()
+
+    def infer(self):
+        """
+        Draws every conclusion following from the sentences changed since
+        the last call, looking only at sentences that share cells with them.
+        """
+        while self.pending:
+            key = self.pending.popleft()
+            sentence = self.sentences.get(key)
+            if sentence is None:
+                # changed again since it was queued
+                continue
+
+            # all cells safe, or all cells mines; marking them
+            # queues every other sentence that mentions them
             if sentence.count == 0:
-                safes = []
-                for item in sentence.cells:
-                    safes.append(item)
-                for item in safes:
-                    self.mark_safe(item)
-            elif sentence.count == len(sentence.cells):
-                mines = []
-                for item in sentence.cells:
-                    mines.append(item)
-                for mine in mines:
-                    self.mark_mine(mine)
-
-        # 5) add any new sentences to the AI's knowledge base
-        #    if they can be inferred from existing knowledge
-        inferred_sentences = []
-        for sentence1 in self.knowledge:
-            for sentence2 in self.knowledge:
-                if sentence1 == sentence2:
+                for index in cell_indexes(key):
+                    self.mark_safe(divmod(index, self.width))
+                continue
+            if sentence.count == key.bit_count():
+                for index in cell_indexes(key):
+                    self.mark_mine(divmod(index, self.width))
+                continue
+
+            # subset rule with every sentence sharing a cell:
+            # if A is a subset of B, then B - A = count(B) - count(A)
+            related = set()
+            for index in cell_indexes(key):
+                related |= self.cell_sentences[index]
+            related.discard(key)
+            for other_key in related:
+                other = self.sentences.get(other_key)
+                if other is None:
                     continue
-                else:
-                    if len(sentence1.cells) == 0 or len(sentence2.cells) == 0:
-                        continue
-                    difference = sentence1.cells - sentence2.cells
-                    if difference:
-                        continue
-                    else:
-                        inferred_sentences.append(Sentence(sentence2.cells - sentence1.cells, sentence2.count - sentence1.count))
-        
-        for sentence in inferred_sentences:
-            self.knowledge.append(sentence)
-
-        inferred_sentences.clear()
-
-        # check mines and safes after inferring new sentences
-        mine_cells = []
-        safe_cells = []
-        for sentence in self.knowledge:
-            if sentence.count == 0:
-                for item in sentence.cells:
-                    safe_cells.append(item)
-            elif sentence.count == sentence.known_mines:
-                for item in sentence.cells:
-                    safe_cells.append(item)
-        
-        for item in mine_cells:
-            self.mark_mine(item)
-        for item in safe_cells:
-            self.mark_safe(item)
+                common = key & other_key
+                if common == key:
+                    self.add_sentence(Sentence.from_mask(other_key ^ key, other.count - sentence.count,
+                                                         self.width))
+                elif common == other_key:
+                    self.add_sentence(Sentence.from_mask(key ^ other_key, sentence.count - other.count,
+                                                         self.width))
 
     def make_safe_move(self):
         """
@@ -303,13 +439,8 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        # look for a safe cell not already played
-        for cell in self.safes:
-            if cell not in self.moves_made:
-                return cell
-        
-        # if all safe cells are played...
-        return None
+        # any safe cell not already played, or None if all are played
+        return self.safe_moves.any()
 
     def make_random_move(self):
         """
@@ -318,26 +449,205 @@ class MinesweeperAI():
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        # listing all cells in the board
-        possible_cells = []
-        for i in range(self.height):
-            for j in range(self.width):
-                possible_cells.append((i, j))
-        
-        # excluding moves made
-        for cell in self.moves_made:
-            if cell in possible_cells:
-                possible_cells.remove(cell)        
-
-        # excluding mines
-        for cell in self.mines:
-            if cell in possible_cells:
-                possible_cells.remove(cell)
-
         # return random cell, or None
-        if len(possible_cells) > 1:
-            return possible_cells[random.randint(0, len(possible_cells) - 1)]
-        elif len(possible_cells) == 1:
-            return possible_cells
-        else:
+        return self.unknown_moves.choice()
+
+    def make_best_guess_move(self):
+        """
+        Returns the move least likely to be a mine among cells that
+        have not already been chosen and are not known to be mines,
+        or None if there is no such cell.
+        """
+        probabilities = self.mine_probabilities()
+        if not probabilities:
             return None
+        lowest = min(probabilities.values())
+        return random.choice(sorted(cell for cell, probability in probabilities.items()
+                                    if probability == lowest))
+
+    def mine_probabilities(self):
+        """
+        Returns the chance of being a mine of every cell not yet
+        chosen nor known to be a mine.
+
+        The frontier (cells some sentence mentions) is split into groups of
+        cells linked by sentences, and every mine layout of each group that
+        satisfies its sentences is counted. With a known mine count, layouts
+        are weighted by the number of ways to place the remaining mines on
+        the cells no sentence mentions.
+        """
+        probabilities = {cell: 0.0 for cell in self.safe_moves}
+        unknown = {cell for cell in self.unknown_moves if cell not in self.safes}
+
+        components = []
+        approximate = []
+        layout_cache = {}
+        for sentences in self.frontier_components():
+            key = frozenset((sentence.mask, sentence.count) for sentence in sentences)
+            if key in self.layout_cache:
+                layouts = self.layout_cache[key]
+            else:
+                layouts = component_layouts(sentences)
+            # keep only the components of this move, they are the likely ones next move
+            layout_cache[key] = layouts
+            if layouts is None:
+                approximate.append(sentences)
+            else:
+                components.append(layouts)
+        self.layout_cache = layout_cache
+
+        # cells of components too big to enumerate get the highest
+        # local estimate, count / cells, of the sentences mentioning them
+        approximate_cells = set()
+        for sentences in approximate:
+            for sentence in sentences:
+                for cell in sentence.cells:
+                    approximate_cells.add(cell)
+                    probabilities[cell] = max(probabilities.get(cell, 0.0),
+                                              sentence.count / sentence.mask.bit_count())
+
+        frontier = set(probabilities) | {cell for cells, _ in components for cell in cells}
+        others = len(unknown - frontier)
+        remaining = None if self.mine_count is None else self.mine_count - len(self.mines)
+        if remaining is not None:
+            # the mines expected on approximated cells aren't left for the others
+            expected = round(sum(probabilities[cell] for cell in approximate_cells))
+            remaining -= min(expected, remaining)
+
+        # distribution of mines over each component, and over all but one
+        weights = [{mines: total for mines, (total, _) in layouts.items()} for _, layouts in components]
+        for index, (cells, layouts) in enumerate(components):
+            rest = {0: 1}
+            for other_index, other in enumerate(weights):
+                if other_index != index:
+                    rest = convolve(rest, other)
+            total_weight = 0
+            cell_weights = [0] * len(cells)
+            for mines, (total, mine_counts) in layouts.items():
+                weight = sum(count * placements(others, remaining, mines + rest_mines)
+                             for rest_mines, count in rest.items())
+                total_weight += total * weight
+                for i, count in enumerate(mine_counts):
+                    cell_weights[i] += count * weight
+            for i, cell in enumerate(cells):
+                probabilities[cell] = cell_weights[i] / total_weight if total_weight else 0.5
+
+        # cells no sentence mentions share the mines left over
+        if others:
+            if remaining is None:
+                probability = DEFAULT_MINE_DENSITY
+            else:
+                everything = {0: 1}
+                for other in weights:
+                    everything = convolve(everything, other)
+                expected = 0
+                total_weight = 0
+                for mines, count in everything.items():
+                    weight = count * placements(others, remaining, mines)
+                    expected += weight * (remaining - mines)
+                    total_weight += weight
+                probability = expected / total_weight / others if total_weight else 1.0
+            for cell in unknown - frontier:
+                probabilities[cell] = probability
+        return probabilities
+
+    def frontier_components(self):
+        """
+        Returns the sentences split into groups that share no cells.
+        """
+        components = []
+        seen = set()
+        for key in self.sentences:
+            if key in seen:
+                continue
+            seen.add(key)
+            component = []
+            queue = [key]
+            while queue:
+                current = queue.pop()
+                component.append(self.sentences[current])
+                for index in cell_indexes(current):
+                    for other in self.cell_sentences[index]:
+                        if other not in seen:
+                            seen.add(other)
+                            queue.append(other)
+            components.append(component)
+        return components
+
+
+def component_layouts(sentences):
+    """
+    Enumerates the mine layouts of the cells mentioned by `sentences`
+    that satisfy all of them.
+
+    Returns the cells, in a fixed order, and a dictionary mapping each
+    number of mines to the number of layouts with that many mines and,
+    for every cell, how many of those layouts have a mine there.
+    Returns None if there are too many cells to enumerate.
+    """
+    cells = sorted({cell for sentence in sentences for cell in sentence.cells})
+    if len(cells) > MAX_COMPONENT_CELLS:
+        return None
+    position = {cell: i for i, cell in enumerate(cells)}
+
+    # for every constraint: mines still to place and cells still unassigned
+    needed = [sentence.count for sentence in sentences]
+    unassigned = [sentence.mask.bit_count() for sentence in sentences]
+    constraints_of = [[] for _ in cells]
+    for index, sentence in enumerate(sentences):
+        for cell in sentence.cells:
+            constraints_of[position[cell]].append(index)
+
+    layouts = {}
+    assignment = [0] * len(cells)
+
+    def assign(i, mines):
+        if i == len(cells):
+            total, mine_counts = layouts.setdefault(mines, [0, [0] * len(cells)])
+            layouts[mines][0] = total + 1
+            for j, value in enumerate(assignment):
+                mine_counts[j] += value
+            return
+        for value in (0, 1):
+            # a value is consistent if every constraint on the cell
+            # can still be met by its remaining cells
+            ok = True
+            for index in constraints_of[i]:
+                needed[index] -= value
+                unassigned[index] -= 1
+                if needed[index] < 0 or needed[index] > unassigned[index]:
+                    ok = False
+            if ok:
+                assignment[i] = value
+                assign(i + 1, mines + value)
+            for index in constraints_of[i]:
+                needed[index] += value
+                unassigned[index] += 1
+
+    assign(0, 0)
+    return cells, {mines: (total, mine_counts) for mines, (total, mine_counts) in layouts.items()}
+
+
+def convolve(first, second):
+    """
+    Combines two distributions of layout counts by number of mines.
+    """
+    combined = {}
+    for first_mines, first_count in first.items():
+        for second_mines, second_count in second.items():
+            mines = first_mines + second_mines
+            combined[mines] = combined.get(mines, 0) + first_count * second_count
+    return combined
+
+
+def placements(cells, remaining, frontier_mines):
+    """
+    Returns the number of ways to place the mines not on the frontier
+    on `cells` free cells, or 1 if the total number of mines is unknown.
+    """
+    if remaining is None:
+        return 1
+    mines = remaining - frontier_mines
+    if mines < 0 or mines > cells:
+        return 0
+    return math.comb(cells, mines)
@@ -1,4 +1,12 @@
+import sys
+import time
+
 from logic import *
+from entailment import compiled_model_check_all, entails_all, model_check_all
+
+# Ways of deciding which symbols a knowledge base entails,
+# all at once, by their command line name
+BACKENDS = {"model": model_check_all, "compiled": compiled_model_check_all, "sat": entails_all}
 
 AKnight = Symbol("A is a Knight")
 AKnave = Symbol("A is a Knave")
@@ -116,6 +124,10 @@ knowledge3 = And(
 
 
 def main():
+    if len(sys.argv) > 2 or (len(sys.argv) == 2 and sys.argv[1] not in BACKENDS):
+        sys.exit(f"Usage: python puzzle.py [{'|'.join(BACKENDS)}]")
+    check = BACKENDS[sys.argv[1] if len(sys.argv) == 2 else "model"]
+
     symbols = [AKnight, AKnave, BKnight, BKnave, CKnight, CKnave]
     puzzles = [
         ("Puzzle 0", knowledge0),
@@ -128,9 +140,13 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
-            for symbol in symbols:
-                if model_check(knowledge, symbol):
+            start = time.perf_counter()
+            entailed = check(knowledge, symbols)
+            elapsed = time.perf_counter() - start
+            for symbol, is_entailed in zip(symbols, entailed):
+                if is_entailed:
                     print(f"    {symbol}")
+            print(f"    ({elapsed * 1000:.2f} ms)", file=sys.stderr)
 
 
 if __name__ == "__main__":